@@ -0,0 +1,203 @@
+"""
+Benchmarks the full crawl against the local mock site, without touching the network.
+
+Starts :mod:`benchmarks.mock_site` in a separate process, then crawls its
+categories through ``MainScraper``/``NeimanMarcusScraper`` and its product
+sitemaps through ``CategoryScraper``, and reports pages/sec, products/sec,
+request latency percentiles, CPU time and peak RSS.
+
+Usage:
+    python -m benchmarks.bench_crawl [--flow listing|sitemap|all] [--latency SECONDS] [--error-rate RATE] [--json]
+"""
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import tempfile
+import statistics
+import multiprocessing
+from benchmarks.mock_site import (
+    run_mock_site, category_path, DEFAULT_PORT, DEFAULT_CATEGORIES, DEFAULT_PAGES, DEFAULT_PER_PAGE,
+)
+from src.scheduler import RequestScheduler
+from src.metrics import metrics
+
+FLOWS = ('listing', 'sitemap', 'all')
+
+
+class TimedScheduler(RequestScheduler):
+    """
+    A request scheduler that records the latency of every request, including retries and pacing.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+
+    async def fetch(self, session, url, headers=None):
+        start = time.perf_counter()
+        try:
+            return await super().fetch(session, url, headers)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def fetch_sync(self, url, headers=None, stream=False):
+        start = time.perf_counter()
+        try:
+            return super().fetch_sync(url, headers, stream)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def wait_for_port(port, timeout=10):
+    """
+    Waits until something listens on a local port.
+
+    Raises:
+        TimeoutError: If the port does not open in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Mock site did not start on port {port}")
+
+
+async def crawl(base_url, flow, categories, scheduler, concurrency, extract_workers, cache_dir):
+    """
+    Crawls the mock site.
+
+    Returns:
+        tuple: The number of valid products scraped and the resources used by the
+            extraction workers (see ``ExtractionStage.worker_usage``).
+    """
+    from main import MainScraper
+    from src.cache import ProductCache
+
+    products = 0
+    async with MainScraper(concurrency=concurrency, base_url=base_url, scheduler=scheduler,
+                           cache=ProductCache(cache_dir), extract_workers=extract_workers) as main_scraper:
+        if flow in ('listing', 'all'):
+            urls = [base_url + category_path(category) for category in range(1, categories + 1)]
+            products += sum((await main_scraper.scrape_categories(urls)).values())
+        if flow in ('sitemap', 'all'):
+            # A fresh cache, so the sitemap flow fetches every product again
+            main_scraper.cache = ProductCache(os.path.join(cache_dir, 'sitemap'))
+            products += await main_scraper.main_sitemap([base_url + '/sitemap_index.xml'], name='bench')
+    extraction = main_scraper.extraction
+    return products, extraction.worker_usage() if extraction is not None else {'cpu_seconds': 0, 'peak_rss': 0}
+
+
+def bench_crawl(flow='all', port=DEFAULT_PORT, categories=DEFAULT_CATEGORIES, pages=DEFAULT_PAGES,
+                per_page=DEFAULT_PER_PAGE, latency=0.0, error_rate=0.0, error_status=503,
+                concurrency=16, rate=None, extract_workers=None):
+    """
+    Runs one crawl against a freshly started mock site.
+
+    Args:
+        flow (str, optional): ``listing`` for category pagination, ``sitemap`` for
+            product sitemaps, or ``all`` for both.
+        port (int, optional): The port of the mock site.
+        categories (int, optional): Number of mock categories.
+        pages (int, optional): Number of listing pages per category.
+        per_page (int, optional): Number of products per listing page.
+        latency (float, optional): Delay in seconds the mock site adds to every response.
+        error_rate (float, optional): Probability that a product request fails.
+        error_status (int, optional): The status of a failing product request.
+        concurrency (int, optional): Maximum number of product requests in flight.
+        rate (float, optional): Requests per second per host; None disables pacing.
+        extract_workers (int, optional): Number of extraction worker processes.
+
+    Returns:
+        dict: The measured throughput, latency, CPU time, peak RSS and per-stage timings.
+    """
+    server = multiprocessing.Process(target=run_mock_site, kwargs=dict(
+        port=port, categories=categories, pages=pages, per_page=per_page,
+        latency=latency, error_rate=error_rate, error_status=error_status,
+    ), daemon=True)
+    server.start()
+    try:
+        wait_for_port(port)
+        scheduler = TimedScheduler(rate=rate, max_concurrency=concurrency)
+        working_dir = os.getcwd()
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Output files and caches go to a throwaway folder
+            os.chdir(temp_dir)
+            try:
+                start = time.perf_counter()
+                products, workers = asyncio.run(crawl(f'http://127.0.0.1:{port}', flow, categories, scheduler,
+                                             concurrency, extract_workers, os.path.join(temp_dir, 'cache')))
+                elapsed = time.perf_counter() - start
+            finally:
+                os.chdir(working_dir)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies = scheduler.latencies
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    cpu = usage.ru_utime - usage_before.ru_utime + usage.ru_stime - usage_before.ru_stime + workers['cpu_seconds']
+    return {
+        'flow': flow,
+        'elapsed': elapsed,
+        'requests': scheduler.requests,
+        'retries': scheduler.retries,
+        'pages_per_sec': len(latencies) / elapsed,
+        'products': products,
+        'products_per_sec': products / elapsed,
+        'latency_p50': percentiles[49] if percentiles else None,
+        'latency_p99': percentiles[98] if percentiles else None,
+        'cpu_seconds': cpu,
+        'cpu_percent': 100 * cpu / elapsed,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': usage.ru_maxrss / 1024,
+        'peak_worker_rss_mb': workers['peak_rss'] / 1024,
+        'stages': metrics.snapshot()['stages'],
+    }
+
+
+def print_results(results):
+    """
+    Prints the results of :func:`bench_crawl` as a table.
+    """
+    print(f"flow          {results['flow']} ({results['elapsed']:.2f}s)")
+    print(f"requests      {results['requests']} ({results['retries']} retries)")
+    print(f"pages/sec     {results['pages_per_sec']:.1f}")
+    print(f"products      {results['products']} ({results['products_per_sec']:.1f}/sec)")
+    print(f"latency       p50 {results['latency_p50'] * 1000:.1f} ms, p99 {results['latency_p99'] * 1000:.1f} ms")
+    print(f"cpu           {results['cpu_seconds']:.2f}s ({results['cpu_percent']:.0f}%)")
+    print(f"peak rss      {results['peak_rss_mb']:.1f} MB (workers {results['peak_worker_rss_mb']:.1f} MB)")
+    for stage, values in results['stages'].items():
+        print(f"  {stage:<16} {values['count']:6d}x {values['mean_seconds'] * 1000:8.2f} ms mean")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--flow', choices=FLOWS, default='all')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--categories', type=int, default=DEFAULT_CATEGORIES)
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help="Listing pages per category")
+    parser.add_argument('--per-page', type=int, default=DEFAULT_PER_PAGE, help="Products per listing page")
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay in seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability that a product request fails")
+    parser.add_argument('--error-status', type=int, default=503, help="Status of a failing product request")
+    parser.add_argument('--concurrency', type=int, default=16, help="Maximum product requests in flight")
+    parser.add_argument('--rate', type=float, default=None, help="Requests per second per host (default: unpaced)")
+    parser.add_argument('--extract-workers', type=int, default=None, help="Extraction processes (0 extracts inline)")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = bench_crawl(args.flow, args.port, args.categories, args.pages, args.per_page, args.latency,
+                          args.error_rate, args.error_status, args.concurrency, args.rate, args.extract_workers)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
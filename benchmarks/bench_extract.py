@@ -0,0 +1,66 @@
+"""
+Benchmarks ``extract_product_data`` against the extractor it replaced.
+
+Measures products/sec; that both produce identical output on the product
+fixtures and on variants of them with optional fields removed is checked by
+``tests/test_extractors.py``.
+
+Usage:
+    python -m benchmarks.bench_extract [--repeat N] [--rounds N] [product.html ...]
+"""
+import argparse
+import glob
+import os
+import time
+from benchmarks import legacy_extract
+from src.item_extract import extract_product_data
+from src.json_extract import extract_json_payload
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+URL = "https://www.neimanmarcus.com/en-id/p/fixture-prod0"
+
+
+def bench_extract(paths, repeat=200, rounds=5):
+    """
+    Times the legacy and current extractors on the given fixtures.
+
+    The extractors take turns for several rounds and the best round of each is
+    kept, so warm-up and background noise do not favor either one.
+
+    Args:
+        paths (list): Paths of the product page HTML files.
+        repeat (int, optional): Number of times each page is extracted per extractor and round.
+        rounds (int, optional): Number of timed rounds per extractor.
+
+    Returns:
+        dict: Mapping of extractor name to products extracted per second in its best round.
+    """
+    payloads = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            payloads.append(extract_json_payload(file.read()))
+
+    results = {'legacy': 0.0, 'current': 0.0}
+    for _ in range(rounds):
+        for name, extract in (('legacy', legacy_extract.extract_product_data), ('current', extract_product_data)):
+            products = 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for payload in payloads:
+                    products += len(extract(payload, URL))
+            results[name] = max(results[name], products / (time.perf_counter() - start))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="Product page HTML files (defaults to the bundled fixtures)")
+    parser.add_argument('--repeat', type=int, default=200, help="Extractions per page per extractor and round")
+    parser.add_argument('--rounds', type=int, default=5, help="Timed rounds per extractor; the best is reported")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, 'product_*.html')))
+    results = bench_extract(paths, args.repeat, args.rounds)
+    for name, products_per_sec in results.items():
+        print(f"{name:<8} {products_per_sec:10.1f} products/sec")
+    print(f"speedup  {results['current'] / results['legacy']:.2f}x")
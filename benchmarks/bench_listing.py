@@ -0,0 +1,58 @@
+"""
+Benchmarks the listing page extractor backends on saved fixture HTML.
+
+That every backend matches the ``bs4`` reference is checked by ``tests/test_extractors.py``.
+
+Usage:
+    python -m benchmarks.bench_listing [--repeat N] [fixture.html ...]
+"""
+import argparse
+import glob
+import os
+import time
+from src.listing_extract import LISTING_EXTRACTORS, available_listing_extractors
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+BASE_URL = "https://www.neimanmarcus.com"
+
+
+def bench_listing(paths, repeat=50):
+    """
+    Times every available backend on the given fixtures.
+
+    Args:
+        paths (list): Paths of the listing page HTML files.
+        repeat (int, optional): Number of times each page is parsed per backend.
+
+    Returns:
+        dict: Mapping of backend name to pages parsed per second.
+    """
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            pages.append(file.read())
+
+    results = {}
+    for name in available_listing_extractors():
+        extract = LISTING_EXTRACTORS[name]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for content in pages:
+                extract(content, BASE_URL)
+        elapsed = time.perf_counter() - start
+        results[name] = repeat * len(pages) / elapsed
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="Listing page HTML files (defaults to the bundled fixtures)")
+    parser.add_argument('--repeat', type=int, default=50, help="Parses per page per backend")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, 'listing_*.html')))
+    results = bench_listing(paths, args.repeat)
+    baseline = results.get('bs4')
+    for name, pages_per_sec in sorted(results.items(), key=lambda item: -item[1]):
+        speedup = f" ({pages_per_sec / baseline:.1f}x bs4)" if baseline else ""
+        print(f"{name:<12} {pages_per_sec:8.1f} pages/sec{speedup}")
@@ -0,0 +1,62 @@
+"""
+Benchmarks extracting the embedded product JSON from saved product pages.
+
+Compares the byte-slicing fast path against the full lxml DOM parse; that both
+produce the same payload is checked by ``tests/test_extractors.py``.
+
+Usage:
+    python -m benchmarks.bench_product_json [--repeat N] [product.html ...]
+"""
+import argparse
+import glob
+import os
+import time
+from src.json_extract import extract_json_payload, extract_json_payload_dom
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def dom_from_text(body):
+    """
+    Reproduces the previous path: decode the response to text, then parse the DOM.
+    """
+    return extract_json_payload_dom(body.decode('utf-8'))
+
+
+def bench_product_json(paths, repeat=50):
+    """
+    Times both extraction paths on the given fixtures.
+
+    Args:
+        paths (list): Paths of the product page HTML files.
+        repeat (int, optional): Number of times each page is extracted per path.
+
+    Returns:
+        dict: Mapping of path name to pages extracted per second.
+    """
+    pages = []
+    for path in paths:
+        with open(path, 'rb') as file:
+            pages.append(file.read())
+
+    results = {}
+    for name, extract in (('dom', dom_from_text), ('fast', extract_json_payload)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for body in pages:
+                extract(body)
+        elapsed = time.perf_counter() - start
+        results[name] = repeat * len(pages) / elapsed
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="Product page HTML files (defaults to the bundled fixtures)")
+    parser.add_argument('--repeat', type=int, default=50, help="Extractions per page per path")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, 'product_*.html')))
+    results = bench_product_json(paths, args.repeat)
+    for name, pages_per_sec in results.items():
+        print(f"{name:<6} {pages_per_sec:8.1f} pages/sec ({pages_per_sec / results['dom']:.1f}x dom)")
@@ -0,0 +1,153 @@
+"""
+Measures the fixed startup cost of a crawl against its startup-time budget.
+
+Times, in fresh interpreters, the import of ``main`` and the delay between
+launching ``python main.py scrape`` and its first request reaching the local
+mock site, plus how long the extraction worker pool takes to return its first
+result. Exits with status 1 when a median exceeds its budget.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+import multiprocessing
+import tempfile
+import urllib.request
+from benchmarks.mock_site import run_mock_site, category_path, FIXTURES_DIR, DEFAULT_PORT
+from benchmarks.bench_crawl import wait_for_port
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds the import of main may take
+IMPORT_BUDGET = 0.25
+# Seconds from launching a scrape until its first request reaches the site
+FIRST_REQUEST_BUDGET = 0.75
+# Seconds until a new extraction worker pool returns its first result
+FIRST_EXTRACTION_BUDGET = 0.5
+BUDGETS = {
+    'import_seconds': IMPORT_BUDGET,
+    'first_request_seconds': FIRST_REQUEST_BUDGET,
+    'first_extraction_seconds': FIRST_EXTRACTION_BUDGET,
+}
+
+
+def time_import():
+    """
+    Returns the seconds a fresh interpreter takes to import ``main``.
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-c', 'import time; start = time.perf_counter(); import main; '
+                               'print(time.perf_counter() - start)'],
+        cwd=ROOT_DIR,
+    )
+    return float(output)
+
+
+def time_first_request(port):
+    """
+    Returns the seconds between launching a scrape of a mock category and its first request.
+
+    A fresh mock site is started for every measurement, so its first request is the scrape's.
+    """
+    server = multiprocessing.Process(target=run_mock_site, kwargs=dict(port=port), daemon=True)
+    server.start()
+    try:
+        wait_for_port(port)
+        base_url = f'http://127.0.0.1:{port}'
+        with tempfile.TemporaryDirectory() as temp_dir:
+            start = time.time()
+            scrape = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT_DIR, 'main.py'), 'scrape', '--base-url', base_url,
+                 base_url + category_path(1)],
+                cwd=temp_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                while True:
+                    with urllib.request.urlopen(base_url + '/stats') as response:
+                        first_request_at = json.load(response)['first_request_at']
+                    if first_request_at is not None:
+                        return first_request_at - start
+                    if scrape.poll() is not None:
+                        raise RuntimeError(f"The scrape exited with status {scrape.returncode} before any request")
+                    time.sleep(0.005)
+            finally:
+                scrape.terminate()
+                scrape.wait()
+    finally:
+        server.terminate()
+        server.join()
+
+
+def time_first_extraction():
+    """
+    Returns the seconds a new extraction worker pool takes to extract its first product page.
+    """
+    from src.pipeline import ExtractionStage
+
+    with open(os.path.join(FIXTURES_DIR, 'product_props.html'), 'rb') as file:
+        body = file.read()
+
+    async def first_extraction():
+        stage = ExtractionStage(workers=1)
+        start = time.perf_counter()
+        try:
+            await stage.extract(body, 'https://www.neimanmarcus.com/en-id/p/fixture-prod0')
+            return time.perf_counter() - start
+        finally:
+            await stage.close()
+
+    return asyncio.run(first_extraction())
+
+
+def bench_startup(runs=5, port=DEFAULT_PORT):
+    """
+    Measures every startup stage several times.
+
+    Args:
+        runs (int, optional): Number of measurements per stage.
+        port (int, optional): The port of the mock site.
+
+    Returns:
+        dict: The median seconds of every stage, its budget and whether it was met.
+    """
+    samples = {
+        'import_seconds': [time_import() for _ in range(runs)],
+        'first_request_seconds': [time_first_request(port) for _ in range(runs)],
+        'first_extraction_seconds': [time_first_extraction() for _ in range(runs)],
+    }
+    return {
+        stage: {'median': statistics.median(values), 'max': max(values), 'budget': BUDGETS[stage],
+                'within_budget': statistics.median(values) <= BUDGETS[stage]}
+        for stage, values in samples.items()
+    }
+
+
+def print_results(results):
+    """
+    Prints the results of :func:`bench_startup` against their budgets.
+    """
+    for stage, values in results.items():
+        status = "ok" if values['within_budget'] else "OVER BUDGET"
+        print(f"{stage:<26} {values['median'] * 1000:7.1f} ms median, {values['max'] * 1000:7.1f} ms max"
+              f" (budget {values['budget'] * 1000:.0f} ms) {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help="Measurements per stage")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args()
+
+    results = bench_startup(args.runs, args.port)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+    sys.exit(0 if all(values['within_budget'] for values in results.values()) else 1)
@@ -0,0 +1,223 @@
+"""
+A local aiohttp mock of the Neiman Marcus site built from the recorded fixtures.
+
+Serves paginated category listings, product pages in both the
+``props.pageProps.productData`` and ``productCatalog`` shapes, a gzipped
+category sitemap and a sitemap index of gzipped product sitemaps, with
+configurable latency and error rate.
+
+Usage:
+    python -m benchmarks.mock_site [--port PORT] [--latency SECONDS] [--error-rate RATE]
+"""
+import os
+import re
+import gzip
+import time
+import random
+import asyncio
+import argparse
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+DEFAULT_PORT = 8766
+DEFAULT_CATEGORIES = 2
+DEFAULT_PAGES = 5
+DEFAULT_PER_PAGE = 60
+
+# Product and category identifiers baked into the fixtures, replaced on every response
+FIXTURE_CATEGORY = 'home-kitchen-dining-dinnerware-cat44700732'
+FIXTURE_PRODUCT_IDS = {'props': b'prod203145566', 'catalog': b'prod219874402'}
+THUMBNAIL_PATTERN = re.compile(r'      <div class="product-thumbnail .*?\n      </div>\n', re.DOTALL)
+PRODUCT_ID_PATTERN = re.compile(r'prod\d+')
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+# A product options entry of the props fixture, and the same entry without its label
+LABELED_OPTION = b'{"label": "size", "values"'
+UNLABELED_OPTION = b'{"values"'
+# The page a bot filter serves instead of a product, with a 200 and no product data
+BLOCK_PAGE = b'<html><head><title>Access Denied</title></head><body>Access denied</body></html>'
+
+
+def category_path(category):
+    return f'/en-id/c/bench-cat{category}'
+
+
+def product_id(category, page, position):
+    return f'prod{category}{page:04d}{position:04d}'
+
+
+class MockSite:
+    """
+    Builds the mock site's responses from the fixture files.
+    """
+
+    def __init__(self, categories=DEFAULT_CATEGORIES, pages=DEFAULT_PAGES, per_page=DEFAULT_PER_PAGE,
+                 latency=0.0, error_rate=0.0, error_status=503, retry_after=0, malformed=(), blocked=()):
+        """
+        Args:
+            categories (int, optional): Number of categories.
+            pages (int, optional): Number of listing pages per category.
+            per_page (int, optional): Number of products per listing page.
+            latency (float, optional): Delay in seconds added to every response.
+            error_rate (float, optional): Probability that a product page request fails.
+            error_status (int, optional): The status returned by a failing request.
+            retry_after (float, optional): The ``Retry-After`` seconds of a failing request.
+            malformed (iterable, optional): IDs of products whose page has a product options
+                entry without a label.
+            blocked (iterable, optional): IDs of products whose page is a block page without
+                any product data.
+        """
+        self.categories = categories
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.malformed = set(malformed)
+        self.blocked = set(blocked)
+        self.requests = 0
+        self.errors = 0
+        # Wall-clock time of the first request, used to measure the crawler's startup time
+        self.first_request_at = None
+        # The lastmod of every category in the category sitemap
+        self.category_lastmod = '2024-01-01'
+
+        with open(os.path.join(FIXTURES_DIR, 'listing_page.html'), encoding='utf-8') as file:
+            listing = file.read()
+        self.thumbnails = THUMBNAIL_PATTERN.findall(listing)
+        self.listing_head = listing[:listing.index(self.thumbnails[0])]
+        self.listing_tail = listing[listing.index('    </div>\n    <nav class="pagination">'):]
+        self.listing_tail = self.listing_tail[:self.listing_tail.index('<nav')] + '{nav}' + \
+            self.listing_tail[self.listing_tail.index('</nav>') + len('</nav>'):]
+        self.products = {}
+        for shape in FIXTURE_PRODUCT_IDS:
+            with open(os.path.join(FIXTURES_DIR, f'product_{shape}.html'), 'rb') as file:
+                self.products[shape] = file.read()
+
+    def product_urls(self, base_url, category):
+        """
+        Returns the product URLs listed in a category, in listing order.
+        """
+        return [f'{base_url}/en-id/p/bench-item-{product_id(category, page, position)}'
+                for page in range(1, self.pages + 1) for position in range(self.per_page)]
+
+    def listing_page(self, category, page):
+        path = category_path(category)
+        thumbnails = []
+        for position in range(self.per_page):
+            thumbnail = self.thumbnails[position % len(self.thumbnails)]
+            thumbnail = PRODUCT_ID_PATTERN.sub(product_id(category, page, position), thumbnail)
+            thumbnails.append(thumbnail.replace(FIXTURE_CATEGORY, f'bench-cat{category}'))
+        links = ''.join(f'<a class="pagination__link" href="{path}?page={number}">{number}</a>'
+                        for number in range(1, self.pages + 1))
+        if page < self.pages:
+            links += f'<a class="arrow-button arrow-button--right" href="{path}?page={page + 1}" aria-label="Next"></a>'
+        head = self.listing_head.replace(FIXTURE_CATEGORY, f'bench-cat{category}')
+        return head + ''.join(thumbnails) + self.listing_tail.replace('{nav}', f'<nav class="pagination">{links}</nav>')
+
+    def product_page(self, identifier):
+        if identifier in self.blocked:
+            return BLOCK_PAGE
+        if identifier in self.malformed:
+            body = self.products['props'].replace(LABELED_OPTION, UNLABELED_OPTION)
+            return body.replace(FIXTURE_PRODUCT_IDS['props'], identifier.encode())
+        shape = 'props' if int(identifier[4:]) % 2 == 0 else 'catalog'
+        return self.products[shape].replace(FIXTURE_PRODUCT_IDS[shape], identifier.encode())
+
+    def category_sitemap(self, base_url):
+        entries = ''.join(f'<url><loc>{base_url}{category_path(category)}</loc><lastmod>{self.category_lastmod}</lastmod></url>'
+                          for category in range(1, self.categories + 1))
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NAMESPACE}">{entries}</urlset>'
+
+    def sitemap_index(self, base_url):
+        entries = ''.join(f'<sitemap><loc>{base_url}/sitemap_products_{category}.xml.gz</loc></sitemap>'
+                          for category in range(1, self.categories + 1))
+        return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_NAMESPACE}">{entries}</sitemapindex>'
+
+    def product_sitemap(self, base_url, category):
+        entries = ''.join(f'<url><loc>{url}</loc><lastmod>2024-01-01</lastmod></url>'
+                          for url in self.product_urls(base_url, category))
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NAMESPACE}">{entries}</urlset>'
+
+    async def respond(self, request, body, content_type, fail=False):
+        if self.first_request_at is None:
+            self.first_request_at = time.time()
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if fail and random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.error_status, headers={'Retry-After': str(self.retry_after)})
+        return web.Response(body=body, content_type=content_type)
+
+    def application(self):
+        """
+        Returns the aiohttp application serving the mock site.
+        """
+        async def listing(request):
+            category = int(request.match_info['category'])
+            page = int(request.query.get('page', '1'))
+            if not 1 <= category <= self.categories or not 1 <= page <= self.pages:
+                raise web.HTTPNotFound()
+            return await self.respond(request, self.listing_page(category, page).encode(), 'text/html')
+
+        async def product(request):
+            match = PRODUCT_ID_PATTERN.search(request.match_info['slug'])
+            if match is None:
+                raise web.HTTPNotFound()
+            return await self.respond(request, self.product_page(match.group(0)), 'text/html', fail=True)
+
+        async def category_sitemap(request):
+            body = gzip.compress(self.category_sitemap(f'{request.scheme}://{request.host}').encode())
+            return await self.respond(request, body, 'application/x-gzip')
+
+        async def sitemap_index(request):
+            body = self.sitemap_index(f'{request.scheme}://{request.host}').encode()
+            return await self.respond(request, body, 'application/xml')
+
+        async def product_sitemap(request):
+            category = int(request.match_info['category'])
+            body = gzip.compress(self.product_sitemap(f'{request.scheme}://{request.host}', category).encode())
+            return await self.respond(request, body, 'application/x-gzip')
+
+        async def stats(request):
+            return web.json_response({'requests': self.requests, 'errors': self.errors,
+                                      'first_request_at': self.first_request_at})
+
+        app = web.Application()
+        app.router.add_get('/en-id/c/bench-cat{category:\\d+}', listing)
+        app.router.add_get('/en-id/p/{slug}', product)
+        app.router.add_get('/sitemap_category_1.xml.gz', category_sitemap)
+        app.router.add_get('/sitemap_index.xml', sitemap_index)
+        app.router.add_get('/sitemap_products_{category:\\d+}.xml.gz', product_sitemap)
+        app.router.add_get('/stats', stats)
+        return app
+
+
+def run_mock_site(port=DEFAULT_PORT, **options):
+    """
+    Serves the mock site on localhost until interrupted.
+
+    Args:
+        port (int, optional): The port to listen on.
+        **options: Options passed to :class:`MockSite`.
+    """
+    web.run_app(MockSite(**options).application(), host='127.0.0.1', port=port, print=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--categories', type=int, default=DEFAULT_CATEGORIES)
+    parser.add_argument('--pages', type=int, default=DEFAULT_PAGES, help="Listing pages per category")
+    parser.add_argument('--per-page', type=int, default=DEFAULT_PER_PAGE, help="Products per listing page")
+    parser.add_argument('--latency', type=float, default=0.0, help="Delay in seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability that a product request fails")
+    parser.add_argument('--error-status', type=int, default=503, help="Status of a failing product request")
+    parser.add_argument('--retry-after', type=float, default=0, help="Retry-After seconds of a failing product request")
+    args = parser.parse_args()
+
+    print(f"Serving mock site on http://127.0.0.1:{args.port}")
+    run_mock_site(args.port, categories=args.categories, pages=args.pages, per_page=args.per_page,
+                  latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                  retry_after=args.retry_after)
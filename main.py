@@ -1,31 +1,172 @@
-import json
+import os
 import re
+import socket
 import logging
-import aiohttp
 import asyncio
-import lxml.html
-from multiprocessing import Pool
-from itertools import chain
-import diskcache
 from src.scraper import NeimanMarcusScraper
-from src.utils import json_data, setup_logging
-from src.item_extract import extract_product_data
+from src.category_scraper import CategoryScraper, CATEGORY_SITEMAPS
+from src.utils import setup_logging
+from src.writer import JsonLinesWriter
+from src.fetch_state import FetchStateStore
+from src.cache import ProductCache, open_cache, DEFAULT_TTL, DEFAULT_VOLATILE_TTL
+from src.scheduler import RequestScheduler, DEFAULT_RATE
+from src.crawl_state import CrawlState, LISTING
+from src.canonical import product_key, canonical_url
+from src.pipeline import ExtractionStage, extract_page, bounded_map
+from src.models import Product
+from src.history import HistoryStore
+from src.export import export_columnar, FORMATS as EXPORT_FORMATS
+from src.metrics import metrics, PRODUCT_FETCH, WRITE, STAGES
+from src.archive import ResponseArchive, reextract, PRODUCT as PRODUCT_PAGE
+from src.workqueue import open_queue, listing_task, product_task, LISTING as LISTING_TASK
 
-setup_logging()
+# Maximum number of product requests in flight at once
+DEFAULT_CONCURRENCY = 16
+# Maximum number of open connections to a single host
+DEFAULT_LIMIT_PER_HOST = 8
+# Total timeout in seconds for a single product request
+DEFAULT_TIMEOUT = 30
+# Seconds a worker waits before polling an empty work queue again
+DEFAULT_POLL_INTERVAL = 1
+# Product pages fetched or waiting per in-flight request, before more product URLs are read
+WINDOW_PER_REQUEST = 4
+# Number of categories crawled at once by scrape_categories
+DEFAULT_PARALLEL_CATEGORIES = 4
+# Output formats of the command line; the columnar ones are exported from the JSON Lines output
+OUTPUT_FORMATS = ('jsonl', 'jsonl.gz') + EXPORT_FORMATS
 
 class MainScraper:
     """
     A class for scraping product data from the Neiman Marcus website.
+
+    A single pooled aiohttp session is shared by every product request, so
+    connections are kept alive and reused instead of paying a TCP connect
+    and TLS handshake per product. Parsing and extraction run in a separate
+    pool of worker processes, so network I/O and CPU work do not compete.
     """
 
-    def __init__(self):
-        self.url_scraper = NeimanMarcusScraper()
-        self.base_url = "https://www.neimanmarcus.com"
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, limit_per_host=DEFAULT_LIMIT_PER_HOST,
+                 timeout=DEFAULT_TIMEOUT, base_url="https://www.neimanmarcus.com", compress_output=False,
+                 incremental=False, state=None, cache=None, cache_html=False,
+                 extract_workers=None, rate=DEFAULT_RATE, scheduler=None, crawl_state=None,
+                 history=None, archive=None):
+        """
+        Args:
+            concurrency (int, optional): Maximum number of product requests in flight.
+            limit_per_host (int, optional): Maximum number of open connections per host.
+            timeout (float, optional): Total timeout in seconds for a single request.
+            base_url (str, optional): Base URL of the site, overridable for a local stub server.
+            compress_output (bool, optional): Whether to gzip the JSON Lines output.
+            incremental (bool, optional): Whether to skip unchanged categories and products and
+                revalidate cached products with conditional GETs.
+            state (FetchStateStore, optional): The freshness state used in incremental mode.
+            cache (ProductCache, optional): The product cache, shared across scrapers if given.
+            cache_html (bool, optional): Whether to also cache the compressed raw product HTML.
+            extract_workers (int, optional): Number of parse/extract worker processes. Defaults
+                to the CPU count; 0 extracts inline on the event loop.
+            rate (float, optional): Sustained requests per second per host.
+            scheduler (RequestScheduler, optional): The request scheduler, shared with the
+                listing scraper. Built from ``rate``, ``limit_per_host`` and ``timeout`` if not given.
+            crawl_state (CrawlState, optional): The persistent frontier that makes an
+                interrupted category crawl resumable.
+            history (HistoryStore, optional): The price and stock history; when given, the
+                changes of every run are written to ``data/deltas/run-<id>.jsonl`` and every
+                category a product is found in is recorded. Removed products are only reported
+                for categories crawled completely with a crawl state.
+            archive (ResponseArchive, optional): Where every fetched listing and product page is
+                archived raw, so products can be re-extracted offline with :func:`reextract`.
+                Closed with the scraper.
+        """
+        self.scheduler = scheduler if scheduler is not None else \
+            RequestScheduler(rate=rate, max_concurrency=limit_per_host, timeout=timeout)
+        self.url_scraper = NeimanMarcusScraper(scheduler=self.scheduler, archive=archive)
+        self.category_scraper = CategoryScraper(scheduler=self.scheduler)
+        self.base_url = base_url
+        self.url_scraper.base_url = base_url
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.concurrency = concurrency
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.compress_output = compress_output
+        self.incremental = incremental
+        self.state = state if state is not None or not incremental else FetchStateStore()
+        # A freshness state opened here is closed with the scraper; a given one belongs to the caller
+        self.owns_state = state is None and self.state is not None
+        self.session = None
+        self.semaphore = None
         # To store scraped data temporarily
-        self.cache = diskcache.Cache("./cache")
+        self.cache = cache if cache is not None else ProductCache()
+        self.cache_html = cache_html
+        self.archive = archive
+        self.crawl_state = crawl_state
+        # Requests in flight per product key, shared by every category
+        self.in_flight = {}
+        self.deduplicated = 0
+        self.extraction = ExtractionStage(extract_workers) if extract_workers != 0 else None
+        self.history = history
+        self.delta_writer = None
+        # Categories crawled without any failure during this run, where missing products count as removed,
+        # mapped to the history run their crawl started in
+        self.completed_categories = {}
+        self.failed_categories = set()
+
+    async def open_session(self):
+        """
+        Opens the shared aiohttp session if it is not already open.
+
+        Returns:
+            aiohttp.ClientSession: The shared session.
+        """
+        if self.session is None or self.session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def close(self):
+        """
+        Closes the shared aiohttp session, stops the extraction workers, ends the history run,
+        closes the archive once the pages still being archived are written and closes the
+        freshness state if this scraper opened it.
+        """
+        if self.history is not None and self.history.run_id is not None:
+            self.write_deltas(self.history.finish_run(self.completed_categories))
+        if self.delta_writer is not None:
+            self.delta_writer.close()
+            self.delta_writer = None
+        # Requests shared across categories outlive the crawl that started them if it was aborted
+        for task in list(self.in_flight.values()):
+            task.cancel()
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        if self.extraction is not None:
+            await self.extraction.close()
+        if self.archive is not None:
+            await asyncio.to_thread(self.archive.close)
+            self.archive = None
+        if self.owns_state:
+            self.state.close()
+            self.owns_state = False
+
+    async def __aenter__(self):
+        await self.open_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
 
     @staticmethod
     def clean_url(url):
@@ -40,82 +181,909 @@ class MainScraper:
         """
         return re.sub(r'\?.*', '', url)
 
-    async def scrape_product_page(self, url):
+    @staticmethod
+    def category_filename(url):
+        """
+        Returns the base name of a category's output file, e.g. ``dinnerware-cat44700732``.
+
+        Args:
+            url (str): The category URL.
+
+        Returns:
+            str: The last path segment with ``?`` and ``/`` replaced by ``_``.
+        """
+        return re.sub(r'[\?/]', '_', url.split('/')[-1])
+
+    async def scrape_product_page(self, url, lastmod=None, category=None):
         """
         Scrapes product data from a given product page URL.
 
+        Products whose price and stock are still fresh in the cache are returned
+        without a request. In incremental mode an older cached product is returned
+        as-is when its sitemap ``lastmod`` is unchanged, and is otherwise revalidated
+        with a conditional GET that reuses the cached data on ``304 Not Modified``.
+
         Args:
             url (str): The URL of the product page.
+            lastmod (str, optional): The product's sitemap ``lastmod`` value.
+            category (str, optional): The category the product was found in, recorded in the archive.
 
         Returns:
-            list: A list of dictionaries containing the scraped product data.
+            list: A list of dictionaries containing the scraped product data, or None if
+                the page could not be fetched.
+
+        Raises:
+            ValueError: If the page has no usable product data, e.g. a block page served
+                with a 200, so the product is retried like a failed request.
         """
         cleaned_url = self.clean_url(url)
-        if cleaned_url in self.cache:
+        key = product_key(url)
+        cached_data = self.cache.get(key)
+        if cached_data is not None:
+            metrics.incr('cache_hits')
             logging.info(f"Using cached data for {cleaned_url}")
-            return self.cache[cleaned_url]
+            return cached_data
+        metrics.incr('cache_misses')
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers) as response:
-                    response.raise_for_status()
-                    html = await response.text()
-        except aiohttp.ClientError as e:
-            logging.error(f"Error accessing URL {cleaned_url}: {e}")
-            return []
-
-        tree = lxml.html.fromstring(html)
-        script_tag = tree.xpath('//script[@type="application/json"]/text()')
-        if script_tag:
-            script_content = script_tag[0].strip()
-            data = json.loads(script_content)
-            product_data = extract_product_data(data, cleaned_url)
-            self.cache[cleaned_url] = product_data
-            return product_data
+        stale_data = self.cache.get_stale(key) if self.incremental else None
+        request_headers = {}
+        if stale_data is not None:
+            if self.state.is_unchanged(key, lastmod):
+                metrics.incr('unchanged_products')
+                logging.info(f"Unchanged since last run, using cached data for {cleaned_url}")
+                self.cache.touch(key)
+                return stale_data
+            request_headers = self.state.conditional_headers(key)
+
+        body = self.cache.get_html(key) if self.cache_html else None
+        if body is not None:
+            metrics.incr('html_cache_hits')
+        response_headers = {}
+        fetched = body is None
+        if fetched:
+            import aiohttp
+
+            session = await self.open_session()
+            try:
+                async with self.semaphore:
+                    with metrics.timer(PRODUCT_FETCH):
+                        response = await self.scheduler.fetch(session, url, headers=request_headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"Error accessing URL {cleaned_url}: {e}")
+                return None
+            if response.status == 304 and stale_data is not None:
+                metrics.incr('not_modified')
+                logging.info(f"Not modified, using cached data for {cleaned_url}")
+                self.cache.touch(key)
+                self.state.update(key, lastmod=lastmod)
+                return stale_data
+            body = response.body
+            response_headers = response.headers
+            if self.archive is not None:
+                await self.archive.aput(cleaned_url, body, PRODUCT_PAGE, category)
+
+        if self.extraction is not None:
+            product_data = await self.extraction.extract(body, cleaned_url)
         else:
-            logging.warning("Product data not found.")
-            return []
+            product_data = extract_page(body, cleaned_url)
+        if product_data is None:
+            raise ValueError(f"No product data found at {cleaned_url}")
+        # Only pages with product data are cached, so a retry fetches a block page again
+        if fetched and self.cache_html:
+            self.cache.set_html(key, body)
+        self.cache.set(key, product_data)
+        if self.incremental:
+            self.state.update_from_headers(key, response_headers, lastmod)
+        return product_data
+
+    async def fetch_product(self, url, lastmod=None, category=None):
+        """
+        Scrapes a product page, sharing one in-flight request per product.
+
+        Product pages found in several categories, or under several URL variants,
+        are only fetched once; later requests for the same product are served by
+        the cache.
+
+        Args:
+            url (str): The URL of the product page.
+            lastmod (str, optional): The product's sitemap ``lastmod`` value.
+            category (str, optional): The category the product was found in, recorded in the
+                archive even when the product is not fetched again.
+
+        Returns:
+            list: The result of :meth:`scrape_product_page`.
+        """
+        key = product_key(url)
+        if self.archive is not None and category:
+            await self.archive.aadd_category(url, category)
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.scrape_product_page(url, lastmod, category))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    async def iter_category_entries(self, session, url):
+        """
+        Streams the product URLs of a category as its listing pages are parsed.
+
+        With a crawl state, the products left pending by an interrupted crawl come
+        first, and listing pages parsed in an earlier run are skipped.
+
+        Args:
+            session (aiohttp.ClientSession): The shared session.
+            url (str): The URL of the category page.
+
+        Yields:
+            tuple: The product URL and its ``lastmod`` (always None for listing pages),
+                once per product.
+        """
+        crawl_state = self.crawl_state
+        seen = set()
+        if crawl_state is None:
+            async for product_url in self.url_scraper.iter_product_urls(session, url):
+                key = product_key(product_url)
+                if key not in seen:
+                    seen.add(key)
+                    yield product_url, None
+            return
+
+        if crawl_state.start_category(url, self.history_run()):
+            logging.info(f"Resuming crawl of {url}")
+        for product_url in crawl_state.pending_products(url):
+            yield product_url, None
+        if crawl_state.listing_done(url):
+            return
+        parsed_pages = crawl_state.urls(url, LISTING, ('done',)) | crawl_state.given_up(url, LISTING)
+        listing_failed = False
+        async for page_url, product_urls in self.url_scraper.iter_listing_pages(session, url, skip=parsed_pages):
+            if product_urls is None:
+                self.failed_categories.add(url)
+                # Pages that keep failing are given up like products, so the category can still finish
+                if not crawl_state.mark_failed(url, page_url, "Listing page could not be fetched", kind=LISTING):
+                    listing_failed = True
+                continue
+            new_urls = crawl_state.add_products(url, product_urls)
+            crawl_state.mark_done(url, page_url, kind=LISTING)
+            for product_url in new_urls:
+                yield product_url, None
+        if not listing_failed:
+            crawl_state.set_listing_done(url)
+
+    async def iter_product_pages(self, entries, category):
+        """
+        Fetches and extracts product pages concurrently, yielding each one as soon as it is done.
+
+        Only ``concurrency * WINDOW_PER_REQUEST`` pages are fetched or waiting at once,
+        and the next entry is only read when one finishes, so listing pages and
+        sitemaps are read no faster than products are scraped.
+
+        Args:
+            entries (async iterable): ``(product_url, lastmod)`` pairs.
+            category (str): The category the products were found in.
+
+        Yields:
+            tuple: The product URL, the result of :meth:`fetch_product` (None if the page could
+                not be scraped) and the error that prevented it, if any.
+        """
+        async def fetch(entry):
+            product_url, lastmod = entry
+            try:
+                return product_url, await self.fetch_product(product_url, lastmod, category), None
+            except Exception as e:
+                # A page the extractor cannot handle fails on its own instead of aborting the crawl
+                metrics.incr('product_errors')
+                logging.error(f"Error scraping product page {product_url}: {e!r}")
+                return product_url, None, e
+
+        async for result in bounded_map(fetch, entries, self.concurrency * WINDOW_PER_REQUEST):
+            yield result
+
+    async def crawl_products(self, entries, writer, category):
+        """
+        Scrapes products and appends the valid ones to the output as they arrive.
 
-    async def main(self, url):
+        With a crawl state, every product is then marked as done, or as failed if
+        its page could not be fetched or extracted.
+
+        Args:
+            entries (async iterable): ``(product_url, lastmod)`` pairs.
+            writer (JsonLinesWriter): The output writer.
+            category (str): The category the products were found in.
+
+        Returns:
+            int: The number of valid products scraped.
+        """
+        scraped = 0
+        async for product_url, product_data, error in self.iter_product_pages(entries, category):
+            if product_data is None:
+                self.failed_categories.add(category)
+                if self.crawl_state is not None:
+                    reason = repr(error) if error is not None else "Product page could not be fetched"
+                    self.crawl_state.mark_failed(category, product_url, reason)
+                continue
+            scraped += len(self.write_products(product_data, writer, category))
+            if self.crawl_state is not None:
+                # Make sure the products are on disk before the page is recorded as done
+                writer.flush()
+                self.crawl_state.mark_done(category, product_url)
+        return scraped
+
+    async def main(self, url, lastmod=None):
         """
         Main function to scrape product data from the given URL.
 
+        Product URLs flow from the listing pages through fetching, extraction and
+        validation straight to the output file, so memory stays bounded by the
+        fetch window however large the category is.
+
         Args:
             url (str): The URL of the category page.
+            lastmod (str, optional): The category's sitemap ``lastmod`` value; in incremental
+                mode the category is skipped when it matches the last completed run.
+
+        Returns:
+            int: The number of valid products scraped from the category.
         """
-        product_urls = self.url_scraper.scrape_all_product_urls(url)
-        file_name = re.sub(r'[\?/]', '_', url.split('/')[-1])
-        tasks = [self.scrape_product_page(url) for url in product_urls]
-        all_data = await asyncio.gather(*tasks)
-        json_data(all_data, f"{file_name}.json", 'data')
+        # Categories are recorded under their canonical URL, which sitemaps and url_category.txt share
+        state_key = canonical_url(url)
+        if self.incremental and self.state.is_unchanged(state_key, lastmod):
+            logging.info(f"Category unchanged since last run, skipping {url}")
+            return 0
+
+        session = await self.open_session()
+        file_name = self.category_filename(url) + ".jsonl"
+        with JsonLinesWriter(file_name, 'data', compress=self.compress_output) as writer:
+            scraped = await self.crawl_products(self.iter_category_entries(session, url), writer, url)
+
+        if self.finish_category(url) and self.incremental and url not in self.failed_categories:
+            self.state.update(state_key, lastmod=lastmod)
+        return scraped
+
+    async def category_lastmods(self, sitemap_urls=None):
+        """
+        Reads the sitemap ``lastmod`` value of every category from the category sitemaps.
+
+        Args:
+            sitemap_urls (list, optional): Category sitemap URLs. Defaults to the site's.
+
+        Returns:
+            dict: The ``lastmod`` values by canonical category URL.
+        """
+        lastmods = {}
+        async for records in self.category_scraper.aiter_sitemaps(sitemap_urls or CATEGORY_SITEMAPS):
+            lastmods.update((canonical_url(record["URL"]), record["LastModified"]) for record in records)
+        return lastmods
+
+    async def scrape_categories(self, urls, parallel=DEFAULT_PARALLEL_CATEGORIES, lastmods=None):
+        """
+        Scrapes several categories concurrently.
+
+        Every category shares this scraper's session, extraction workers, cache and
+        request scheduler, so small categories do not pay any startup cost of their
+        own, and products listed in several categories are fetched once.
+
+        Args:
+            urls (list): The category URLs.
+            parallel (int, optional): Maximum number of categories crawled at once.
+            lastmods (dict, optional): The categories' sitemap ``lastmod`` values by canonical URL,
+                see :meth:`category_lastmods`; in incremental mode unchanged categories are skipped.
+
+        Returns:
+            dict: The number of valid products scraped from every category URL.
+        """
+        limit = asyncio.Semaphore(parallel)
+        lastmods = lastmods or {}
+
+        async def scrape_category(url):
+            async with limit:
+                print("Processing: ", url)
+                return url, await self.main(url, lastmods.get(canonical_url(url)))
+
+        return dict(await asyncio.gather(*(scrape_category(url) for url in urls)))
+
+    async def iter_sitemap_entries(self, sitemap_urls, category):
+        """
+        Streams the product URLs of product sitemaps as they are parsed.
+
+        With a crawl state, the products left pending by an interrupted crawl come
+        first, and the sitemaps are not read again once they were read completely.
+        If any sitemap could not be read, the listing is left incomplete, so the
+        products it would have listed are not reported as removed.
+
+        Args:
+            sitemap_urls (list): Product sitemap or sitemap index URLs.
+            category (str): The name of the crawl in the crawl state, ``sitemap:<name>``.
+
+        Yields:
+            tuple: The product URL and its sitemap ``lastmod``, once per product.
+        """
+        crawl_state = self.crawl_state
+        seen = set()
+        if crawl_state is not None:
+            if crawl_state.start_category(category, self.history_run()):
+                logging.info(f"Resuming crawl of {category}")
+            for product_url in crawl_state.pending_products(category):
+                yield product_url, None
+            if crawl_state.listing_done(category):
+                return
+        failed_sitemaps = []
+        async for records in self.category_scraper.aiter_sitemaps(sitemap_urls, failed=failed_sitemaps):
+            entries = [(record["URL"], record["LastModified"]) for record in records]
+            if crawl_state is not None:
+                entries = crawl_state.add_product_entries(category, entries)
+            for product_url, lastmod in entries:
+                if crawl_state is None:
+                    key = product_key(product_url)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                yield product_url, lastmod
+        if failed_sitemaps:
+            self.failed_categories.add(category)
+            logging.warning(f"{len(failed_sitemaps)} sitemaps of {category} could not be read, "
+                            "run scrape --sitemap again to finish the crawl")
+        elif crawl_state is not None:
+            crawl_state.set_listing_done(category)
+
+    async def main_sitemap(self, sitemap_urls, name="catalog"):
+        """
+        Scrapes every product listed in product sitemaps, without listing page pagination.
+
+        Sitemap records are streamed into the crawl as they are parsed, and carry
+        their ``lastmod`` so incremental runs skip unchanged products.
+
+        Args:
+            sitemap_urls (list): Product sitemap or sitemap index URLs.
+            name (str, optional): The name of the output file and of the crawl in the crawl state.
+
+        Returns:
+            int: The number of valid products scraped.
+        """
+        await self.open_session()
+        category = f"sitemap:{name}"
+        with JsonLinesWriter(f"{name}.jsonl", 'data', compress=self.compress_output) as writer:
+            scraped = await self.crawl_products(self.iter_sitemap_entries(sitemap_urls, category), writer, category)
+
+        self.finish_category(category)
+        return scraped
+
+    def finish_category(self, category):
+        """
+        Clears a category from the crawl state once nothing is left to crawl.
+
+        Args:
+            category (str): The category URL, or ``sitemap:<name>`` for sitemap crawls.
+
+        Returns:
+            bool: True if the category was fully crawled.
+        """
+        crawl_state = self.crawl_state
+        if crawl_state is None:
+            return True
+        if not crawl_state.listing_done(category) or crawl_state.pending_products(category):
+            logging.warning(f"Crawl of {category} is incomplete, run again to resume it")
+            return False
+        if crawl_state.has_failures(category):
+            # Pages given up in this or an earlier run leave products unseen that were not removed
+            self.failed_categories.add(category)
+        # A resumed crawl only saw the products left pending, so removals count from the run it started in
+        started_run = crawl_state.started_run(category)
+        crawl_state.finish_category(category)
+        if category not in self.failed_categories and started_run is not None:
+            self.completed_categories[category] = started_run
+        return True
+
+    def history_run(self):
+        """
+        Returns the current history run, starting it if needed.
+
+        Returns:
+            int: The run ID, or None without a history.
+        """
+        if self.history is None:
+            return None
+        if self.history.run_id is None:
+            self.history.start_run()
+        return self.history.run_id
+
+    def write_deltas(self, changes):
+        """
+        Appends price and stock changes to the current run's delta file.
+
+        Args:
+            changes (list): Changes returned by the history store.
+        """
+        if not changes:
+            return
+        if self.delta_writer is None:
+            # Every change carries its run, which finish_run has already closed for removals
+            self.delta_writer = JsonLinesWriter(f"run-{changes[0]['run_id']}.jsonl", 'data/deltas', key=None)
+        for change in changes:
+            self.delta_writer.write(change)
+
+    @staticmethod
+    def is_valid_product(product):
+        """
+        Checks that a product has a brand, name, price and ID.
+
+        Args:
+            product (dict): The extracted product data.
+
+        Returns:
+            bool: True if none of the required fields is empty.
+        """
+        return bool(product["Brand"] and product["Name"] and product["Price"] and product["ID"])
+
+    def write_products(self, product_data, writer, category=None):
+        """
+        Appends the valid products of a page to the output and records them in the history.
+
+        Args:
+            product_data (list): The products extracted from the page.
+            writer (JsonLinesWriter): The category's output writer.
+            category (str, optional): The category URL the products were found in.
+
+        Returns:
+            list: The valid products.
+        """
+        valid_products = [product for product in product_data if self.is_valid_product(product)]
+        with metrics.timer(WRITE):
+            metrics.incr('products_written', writer.write_many(valid_products))
+        if self.history is not None:
+            for product in valid_products:
+                self.write_deltas(self.history.record(Product.from_record(product), category))
+        return valid_products
+
+    async def process_task(self, queue, lease, writers, worker_id):
+        """
+        Runs one leased work queue task and acknowledges it, or releases it on failure.
+
+        A listing task queues the page's products and, if it expands, the category's
+        other listing pages. A product task scrapes the product once and writes it into
+        the worker's own output file of every category it was found in. Queue calls run
+        in a thread, so a slow queue never stalls the other tasks.
+
+        Args:
+            queue (SQLiteWorkQueue or RedisWorkQueue): The shared work queue.
+            lease (Lease): The leased task.
+            writers (dict): The worker's output writers by category, opened as needed.
+            worker_id (str): The worker's name, appended to its output file names.
+        """
+        task = lease.task
+        try:
+            if task['kind'] == LISTING_TASK:
+                session = await self.open_session()
+                product_urls, next_page_url, last_page = await self.url_scraper.fetch_listing_page(session, task['url'])
+                tasks = [product_task(product_url, task['category']) for product_url in product_urls]
+                if task['expand'] and next_page_url:
+                    if last_page and last_page > 1:
+                        tasks.extend(listing_task(self.url_scraper.page_url(task['category'], page), task['category'], expand=False)
+                                     for page in range(2, last_page + 1))
+                    else:
+                        tasks.append(listing_task(next_page_url, task['category']))
+                await asyncio.to_thread(queue.put, tasks)
+            else:
+                product_data = await self.fetch_product(task['url'], task['lastmod'], task['category'])
+                if product_data is None:
+                    await asyncio.to_thread(queue.nack, lease, "Product page could not be fetched")
+                    return
+                for category in task['categories']:
+                    if category not in writers:
+                        file_name = self.category_filename(category) + f".{worker_id}.jsonl"
+                        writers[category] = JsonLinesWriter(file_name, 'data', compress=self.compress_output)
+                    self.write_products(product_data, writers[category], category)
+                    # Make sure the products are on disk before the task is acknowledged
+                    writers[category].flush()
+        except Exception as e:
+            logging.error(f"Task {lease.id} failed (attempt {lease.attempts}): {e!r}")
+            await asyncio.to_thread(queue.nack, lease, e)
+            return
+        await asyncio.to_thread(queue.ack, lease)
+
+    async def run_worker(self, queue, worker_id=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        Works through a shared work queue until it is empty.
+
+        Several workers, on one or many machines, can run against the same queue;
+        each leases up to ``concurrency`` tasks at a time. Tasks leased by a worker
+        that dies are handed out again once their visibility timeout expires, and
+        the worker only stops when no task is ready or leased anywhere.
+
+        Args:
+            queue (SQLiteWorkQueue or RedisWorkQueue): The shared work queue.
+            worker_id (str, optional): The worker's name. Defaults to ``<host>-<pid>``.
+            poll_interval (float, optional): Seconds between polls of an empty queue.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        writers = {}
+        running = set()
+        try:
+            while True:
+                leases = await asyncio.to_thread(queue.lease, self.concurrency - len(running)) \
+                    if len(running) < self.concurrency else []
+                for lease in leases:
+                    task = asyncio.create_task(self.process_task(queue, lease, writers, worker_id))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                if running:
+                    await asyncio.wait(running, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+                elif not leases:
+                    stats = await asyncio.to_thread(queue.stats)
+                    if not stats['ready'] and not stats['leased']:
+                        break
+                    await asyncio.sleep(poll_interval)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        logging.info(f"Worker {worker_id} finished: {await asyncio.to_thread(queue.stats)}")
+
+def reextract_archive(archive, folder_path="data/reextracted", workers=None, compress_output=False):
+    """
+    Rebuilds the category output files from the latest archived product pages, without any network access.
+
+    Like a crawl, only new or changed products are appended to existing output files,
+    so rerunning after an extractor change appends exactly the products it affects.
+    A product is written to the file of every category it was found in, and products
+    archived without a category go to ``archive.jsonl``.
+
+    Args:
+        archive (ResponseArchive): The archive of raw product pages.
+        folder_path (str, optional): The folder of the rebuilt JSON Lines files.
+        workers (int, optional): Number of extraction processes. Defaults to the CPU count.
+        compress_output (bool, optional): Whether to gzip the JSON Lines output.
+
+    Returns:
+        int: The number of new or changed products written.
+    """
+    writers = {}
+    written = 0
+    try:
+        for url, categories, product_data in reextract(archive, workers):
+            if not product_data:
+                continue
+            valid_products = [product for product in product_data if MainScraper.is_valid_product(product)]
+            for category in categories or [None]:
+                file_name = (MainScraper.category_filename(category) if category else "archive") + ".jsonl"
+                if file_name not in writers:
+                    writers[file_name] = JsonLinesWriter(file_name, folder_path, compress=compress_output)
+                written += writers[file_name].write_many(valid_products)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return written
+
+
+def read_urls(path):
+    """
+    Reads the category URLs of a file such as ``url_category.txt``, one per line.
+    """
+    with open(path, "r", encoding="utf8") as file:
+        return [line.strip() for line in file.read().splitlines() if line.strip()]
+
+
+def scraper_from_args(args, **options):
+    """
+    Builds a ``MainScraper`` from the crawl options of the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        **options: Further ``MainScraper`` arguments, e.g. a crawl state.
+
+    Returns:
+        MainScraper: The scraper.
+    """
+    cache = open_cache(args.cache_dir, ttl=args.cache_ttl, volatile_ttl=args.fresh_ttl)
+    return MainScraper(
+        concurrency=args.concurrency, limit_per_host=args.limit_per_host, timeout=args.timeout,
+        base_url=args.base_url, compress_output=args.format == 'jsonl.gz', incremental=args.incremental,
+        cache=cache, cache_html=args.cache_html, extract_workers=args.extract_workers, rate=args.rate,
+        archive=ResponseArchive(args.archive) if args.archive else None, **options,
+    )
+
+
+async def start_metrics(args):
+    """
+    Starts the profiling and the Prometheus endpoint requested on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        aiohttp.web.AppRunner: The metrics server, or None if no ``--metrics-port`` was given.
+    """
+    if args.profile_stage:
+        metrics.profile(args.profile_stage)
+    if args.metrics_port is None:
+        return None
+    return await metrics.serve(port=args.metrics_port)
+
+
+def output_path(name, args):
+    """
+    Returns the path of the JSON Lines output file of a category or sitemap crawl.
+    """
+    return os.path.join('data', name + ('.jsonl.gz' if args.format == 'jsonl.gz' else '.jsonl'))
+
+
+async def crawl(args, urls=(), sitemap_urls=(), sitemap_names=()):
+    """
+    Crawls categories concurrently and product sitemaps with one shared scraper.
+
+    The crawl is checkpointed to the crawl state and recorded in the history;
+    with a Parquet or CSV output format, every output file is exported once the
+    crawl ends.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        urls (list, optional): Category URLs.
+        sitemap_urls (list, optional): Product sitemap or sitemap index URLs, crawled under
+            the name ``args.name``.
+        sitemap_names (list, optional): Names of started sitemap crawls whose pending
+            products are resumed.
+    """
+    reporter = asyncio.create_task(metrics.report_periodically())
+    output_names = []
+    crawl_state = CrawlState()
+    history = HistoryStore()
+    metrics_server = None
+    try:
+        metrics_server = await start_metrics(args)
+        async with scraper_from_args(args, crawl_state=crawl_state, history=history) as main_scraper:
+            if urls:
+                lastmods = await main_scraper.category_lastmods(args.category_sitemap) if args.incremental else None
+                await main_scraper.scrape_categories(urls, args.parallel, lastmods)
+                output_names.extend(main_scraper.category_filename(url) for url in urls)
+            if sitemap_urls:
+                await main_scraper.main_sitemap(sitemap_urls, args.name)
+                output_names.append(args.name)
+            for name in sitemap_names:
+                await main_scraper.main_sitemap([], name)
+                output_names.append(name)
+            main_scraper.cache.log_stats()
+            logging.info(f"Shared {main_scraper.deduplicated} in-flight product requests across categories")
+    finally:
+        reporter.cancel()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        crawl_state.close()
+        history.close()
+    metrics.log_summary()
+    metrics.dump("data/metrics.json")
+    if args.format in EXPORT_FORMATS:
+        for name in output_names:
+            if os.path.exists(output_path(name, args)):
+                export_columnar(output_path(name, args), args.format, latest_only=True)
+
+
+def scrape(args):
+    """
+    Runs the ``scrape`` command.
+    """
+    urls = args.urls or ([] if args.sitemap else read_urls(args.file))
+    asyncio.run(crawl(args, urls, args.sitemap))
+
+
+def resume(args):
+    """
+    Runs the ``resume`` command: finishes every category crawl left incomplete by an earlier run.
+    """
+    crawl_state = CrawlState()
+    urls = []
+    sitemap_names = []
+    for category in crawl_state.categories():
+        if not category.startswith("sitemap:"):
+            urls.append(category)
+        elif crawl_state.listing_done(category):
+            sitemap_names.append(category[len("sitemap:"):])
+        else:
+            logging.warning(f"Sitemaps of {category} were not fully read, run scrape --sitemap again to resume it")
+    crawl_state.close()
+    if not urls and not sitemap_names:
+        print("Nothing to resume")
+        return
+    asyncio.run(crawl(args, urls, sitemap_names=sitemap_names))
+
+
+def categories(args):
+    """
+    Runs the ``categories`` command: lists the category URLs of the category sitemaps.
+    """
+    category_scraper = CategoryScraper(incremental=args.incremental, scheduler=RequestScheduler(timeout=args.timeout))
+    try:
+        urls = [record["URL"] for record in category_scraper.iter_categories(args.sitemap or None)]
+    finally:
+        if category_scraper.state is not None:
+            category_scraper.state.close()
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as file:
+            file.write("\n".join(urls) + "\n")
+        print(f"Data saved to {args.output} ({len(urls)} categories)")
+    else:
+        print("\n".join(urls))
+
+
+def seed(args):
+    """
+    Runs the ``seed`` command: queues category listing tasks on the shared work queue.
+    """
+    queue = open_queue(args.queue)
+    urls = args.urls or read_urls(args.file)
+    print(f"Queued {queue.put(listing_task(url) for url in urls)} categories")
+    queue.close()
+
+
+def work(args):
+    """
+    Runs the ``worker`` command: works through the shared work queue until it is empty.
+    """
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    async def run_worker(queue):
+        metrics_server = await start_metrics(args)
+        try:
+            async with scraper_from_args(args) as main_scraper:
+                await main_scraper.run_worker(queue, worker_id)
+                main_scraper.cache.log_stats()
+        finally:
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+        metrics.log_summary()
+        if args.profile_stage:
+            metrics.dump(f"data/metrics.{worker_id}.json")
+
+    queue = open_queue(args.queue)
+    asyncio.run(run_worker(queue))
+    queue.close()
+
+
+def rebuild(args):
+    """
+    Runs the ``reextract`` command: rebuilds the output from the response archive.
+    """
+    archive = ResponseArchive(args.archive)
+    written = reextract_archive(archive, args.output_dir, args.workers, args.format == 'jsonl.gz')
+    print(f"Re-extracted {written} new or changed products from {archive.directory}")
+    archive.close()
+
+
+def bench(args):
+    """
+    Runs the ``bench`` command: an offline crawl or startup benchmark against the local mock site.
+    """
+    if args.startup:
+        from benchmarks import bench_startup
+
+        bench_startup.print_results(bench_startup.bench_startup())
+        return
+    from benchmarks.bench_crawl import bench_crawl, print_results
+
+    options = {option: getattr(args, option) for option in ('categories', 'pages', 'latency', 'error_rate')
+               if getattr(args, option) is not None}
+    print_results(bench_crawl(args.flow, concurrency=args.concurrency, rate=args.rate,
+                              extract_workers=args.extract_workers, **options))
+
+
+def build_parser():
+    """
+    Builds the command line parser.
+
+    Returns:
+        argparse.ArgumentParser: The parser of every command.
+    """
+    import argparse
+
+    crawl_options = argparse.ArgumentParser(add_help=False)
+    group = crawl_options.add_argument_group("crawl options")
+    group.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Maximum product requests in flight")
+    group.add_argument('--limit-per-host', type=int, default=DEFAULT_LIMIT_PER_HOST,
+                       help="Maximum concurrent requests per host")
+    group.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Requests per second per host")
+    group.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Timeout in seconds of a request")
+    group.add_argument('--extract-workers', type=int, default=None,
+                       help="Extraction processes (default: CPU count, 0 extracts inline)")
+    group.add_argument('--base-url', default="https://www.neimanmarcus.com", help="Base URL of the site")
+    group.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl',
+                       help="Output format; parquet and csv are exported from the JSON Lines output after the crawl")
+    group.add_argument('--archive', help="Archive raw listing and product pages in this folder")
+    group = crawl_options.add_argument_group("cache policy")
+    group.add_argument('--cache-dir', default="./cache",
+                       help="Product cache folder, or a redis:// URL for a cache shared across machines")
+    group.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL, help="Seconds an extracted product is kept")
+    group.add_argument('--fresh-ttl', type=float, default=DEFAULT_VOLATILE_TTL,
+                       help="Seconds a cached price and stock are trusted without a request (0 refetches every product)")
+    group.add_argument('--cache-html', action='store_true', help="Also cache the compressed raw product pages")
+    group.add_argument('--incremental', action='store_true',
+                       help="Skip unchanged categories and products and revalidate cached ones with conditional GETs")
+    group.add_argument('--category-sitemap', action='append', default=[],
+                       help="Category sitemap read for the category lastmod values in incremental mode "
+                            "(repeatable, default: the site's)")
+    group = crawl_options.add_argument_group("metrics")
+    group.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics at /metrics on this port during the crawl")
+    group.add_argument('--profile-stage', choices=STAGES,
+                       help="Profile one stage with cProfile, saved next to the metrics as a .prof file "
+                            "(parse and extract stages only with --extract-workers 0)")
+
+    parser = argparse.ArgumentParser(description="Scrape products from the Neiman Marcus website.")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    command = commands.add_parser('scrape', parents=[crawl_options], help="Scrape categories or product sitemaps (default)")
+    command.add_argument('urls', nargs='*', help="Category URLs (default: those of --file)")
+    command.add_argument('--file', default="url_category.txt", help="File of category URLs, one per line")
+    command.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL_CATEGORIES,
+                         help="Categories crawled at once")
+    command.add_argument('--sitemap', action='append', default=[],
+                         help="Crawl the products of a product sitemap or sitemap index instead (repeatable)")
+    command.add_argument('--name', default="catalog", help="Output name of a sitemap crawl")
+    command.set_defaults(handler=scrape)
+
+    command = commands.add_parser('resume', parents=[crawl_options], help="Finish the crawls left incomplete by an earlier run")
+    command.add_argument('--parallel', type=int, default=DEFAULT_PARALLEL_CATEGORIES,
+                         help="Categories crawled at once")
+    command.set_defaults(handler=resume)
+
+    command = commands.add_parser('categories', help="List the category URLs of the category sitemaps")
+    command.add_argument('--sitemap', action='append', default=[], help="Category sitemap URL (repeatable)")
+    command.add_argument('--output', help="Write the URLs to this file, e.g. url_category.txt")
+    command.add_argument('--incremental', action='store_true', help="Only list categories changed since the last crawl")
+    command.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="Timeout in seconds of a request")
+    command.set_defaults(handler=categories)
+
+    command = commands.add_parser('seed', help="Queue categories on a shared work queue")
+    command.add_argument('urls', nargs='*', help="Category URLs (default: those of --file)")
+    command.add_argument('--file', default="url_category.txt", help="File of category URLs, one per line")
+    command.add_argument('--queue', required=True, help="Shared work queue: a SQLite file path or a redis:// URL")
+    command.set_defaults(handler=seed)
+
+    command = commands.add_parser('worker', parents=[crawl_options], help="Work through a shared work queue until it is empty")
+    command.add_argument('--queue', required=True, help="Shared work queue: a SQLite file path or a redis:// URL")
+    command.add_argument('--worker-id', help="Name appended to the output files (default: <host>-<pid>)")
+    command.set_defaults(handler=work)
+
+    command = commands.add_parser('reextract', help="Rebuild the output from the response archive, without crawling")
+    command.add_argument('--archive', default="./archive", help="The response archive folder")
+    command.add_argument('--output-dir', default="data/reextracted", help="Folder of the rebuilt output")
+    command.add_argument('--workers', type=int, default=None, help="Extraction processes (default: CPU count)")
+    command.add_argument('--format', choices=('jsonl', 'jsonl.gz'), default='jsonl', help="Output format")
+    command.set_defaults(handler=rebuild)
+
+    command = commands.add_parser('bench', help="Benchmark a crawl of the local mock site")
+    command.add_argument('--flow', choices=('listing', 'sitemap', 'all'), default='all')
+    command.add_argument('--categories', type=int, help="Number of mock categories")
+    command.add_argument('--pages', type=int, help="Listing pages per category")
+    command.add_argument('--latency', type=float, help="Delay in seconds added to every response")
+    command.add_argument('--error-rate', type=float, help="Probability that a product request fails")
+    command.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Maximum product requests in flight")
+    command.add_argument('--rate', type=float, default=None, help="Requests per second per host (default: unpaced)")
+    command.add_argument('--extract-workers', type=int, default=None, help="Extraction processes (0 extracts inline)")
+    command.add_argument('--startup', action='store_true',
+                         help="Measure import time and time to first request against their budgets instead")
+    command.set_defaults(handler=bench)
+    parser.commands = commands.choices
+    return parser
+
+
+def cli(argv=None):
+    """
+    Runs the command line; without a command, ``scrape`` crawls the categories of ``url_category.txt``.
+
+    Args:
+        argv (list, optional): The arguments. Defaults to ``sys.argv[1:]``.
+    """
+    import sys
+
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    if not argv or argv[0].startswith('-') and argv[0] not in ('-h', '--help'):
+        # Options given before a command belong to it; argparse rejects them with a usage error
+        if not any(arg in parser.commands for arg in argv):
+            argv.insert(0, 'scrape')
+    args = parser.parse_args(argv)
+    setup_logging()
+    args.handler(args)
 
-    def scrape_and_append(self, url):
-        product_data = asyncio.run(self.scrape_product_page(url))
-        return product_data
 
 if __name__ == "__main__":
-    with open("url_category.txt", "r", encoding="utf8") as file:
-        url_category = file.read().splitlines()
-
-    for url in url_category:
-        print("Processing: ", url)
-        main_scraper = MainScraper()
-        product_urls = main_scraper.url_scraper.scrape_all_product_urls(url)
-        with Pool() as pool:
-            product_data = pool.map(main_scraper.scrape_and_append, product_urls)
-            all_data = list(chain(*product_data))
-
-        # Filter out products with invalid or empty values
-        valid_products = [product for product in all_data if product["Brand"] and product["Name"] and product["Price"] and product["ID"]]
-
-        # Flatten the "Images" list
-        for product in valid_products:
-          product["Images"] = product["Images"]
-          if "Skus" in product:
-              product["Skus"] = [sku for sku in product["Skus"]]
-          else:
-              None
-
-        # Save the cleaned data to a JSON file with the category URL as the filename
-        file_name = re.sub(r'[\?/]', '_', url.split('/')[-1]) + ".json"
-        json_data(valid_products, file_name, 'data')
\ No newline at end of file
+    cli()
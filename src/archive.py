@@ -0,0 +1,282 @@
+import os
+import gzip
+import time
+import asyncio
+import hashlib
+import sqlite3
+import functools
+from src.canonical import product_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LISTING = 'listing'
+PRODUCT = 'product'
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+# Number of archived pages handed to a worker process at a time
+REEXTRACT_CHUNK_SIZE = 16
+
+
+def compress(body, codec):
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def decompress(data, codec):
+    if codec == ZSTD:
+        if zstandard is None:
+            raise ImportError("The archive contains zstd objects; install zstandard to read them")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class ResponseArchive:
+    """
+    A compressed, content-addressed archive of raw listing and product page responses.
+
+    Every response body is stored once under its SHA-256 digest, compressed with
+    zstd when ``zstandard`` is installed and gzip otherwise, so pages that did
+    not change between crawls cost no extra space. A SQLite index records every
+    fetch with its URL, kind, category and time, and every category each product
+    was found in, so extraction can be rerun offline against the latest archived
+    version of every page.
+
+    Crawlers archive through :meth:`aput`, which compresses and writes in a
+    dedicated thread, one page at a time, so the event loop never waits on disk.
+    """
+
+    def __init__(self, directory="./archive", codec=None):
+        """
+        Args:
+            directory (str, optional): The archive folder.
+            codec (str, optional): ``zstd`` or ``gzip`` for new objects. Defaults to zstd
+                when available.
+        """
+        if codec is None:
+            codec = ZSTD if zstandard is not None else GZIP
+        if codec == ZSTD and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package")
+        self.directory = directory
+        self.codec = codec
+        self.objects_path = os.path.join(directory, 'objects')
+        if not os.path.exists(self.objects_path):
+            os.makedirs(self.objects_path)
+        self.connection = sqlite3.connect(os.path.join(directory, 'index.db'), isolation_level=None,
+                                          check_same_thread=False)
+        self._executor = None
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "  digest TEXT PRIMARY KEY, codec TEXT NOT NULL, size INTEGER, stored_size INTEGER);"
+            "CREATE TABLE IF NOT EXISTS fetches ("
+            "  url TEXT NOT NULL, kind TEXT NOT NULL, category TEXT, fetched_at REAL NOT NULL, digest TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS fetches_url ON fetches (url, fetched_at);"
+            "CREATE TABLE IF NOT EXISTS memberships ("
+            "  product TEXT NOT NULL, category TEXT NOT NULL, PRIMARY KEY (product, category));"
+        )
+
+    @property
+    def executor(self):
+        """
+        ThreadPoolExecutor: The single thread archiving pages for :meth:`aput`, started on first use.
+        """
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='archive')
+        return self._executor
+
+    def object_path(self, digest):
+        """
+        Returns the path of an archived object.
+        """
+        return os.path.join(self.objects_path, digest[:2], digest[2:])
+
+    def put(self, url, body, kind=PRODUCT, category=None):
+        """
+        Archives a response body and records the fetch.
+
+        Args:
+            url (str): The page URL.
+            body (bytes): The raw response body.
+            kind (str, optional): ``listing`` or ``product``.
+            category (str, optional): The category the page was crawled for.
+
+        Returns:
+            str: The SHA-256 digest of the body.
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        known = self.connection.execute("SELECT 1 FROM objects WHERE digest = ?", (digest,)).fetchone()
+        if known is None:
+            data = compress(body, self.codec)
+            path = self.object_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+            self.connection.execute(
+                "INSERT OR IGNORE INTO objects (digest, codec, size, stored_size) VALUES (?, ?, ?, ?)",
+                (digest, self.codec, len(body), len(data)),
+            )
+        self.connection.execute(
+            "INSERT INTO fetches (url, kind, category, fetched_at, digest) VALUES (?, ?, ?, ?, ?)",
+            (url, kind, category, time.time(), digest),
+        )
+        if kind == PRODUCT and category:
+            self.add_category(url, category)
+        return digest
+
+    async def aput(self, url, body, kind=PRODUCT, category=None):
+        """
+        Asynchronously archives a response body in the archive's thread; see :meth:`put`.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(self.put, url, body, kind, category))
+
+    def add_category(self, url, category):
+        """
+        Records that a product was found in a category.
+
+        Args:
+            url (str): Any URL of the product.
+            category (str): The category URL.
+        """
+        self.connection.execute(
+            "INSERT OR IGNORE INTO memberships (product, category) VALUES (?, ?)", (product_key(url), category)
+        )
+
+    async def aadd_category(self, url, category):
+        """
+        Asynchronously records that a product was found in a category; see :meth:`add_category`.
+        """
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.add_category, url, category)
+
+    def categories(self, url):
+        """
+        Returns every category a product was found in.
+
+        Args:
+            url (str): Any URL of the product.
+
+        Returns:
+            list: The category URLs, sorted.
+        """
+        return [category for category, in self.connection.execute(
+            "SELECT category FROM memberships WHERE product = ? ORDER BY category", (product_key(url),)
+        )]
+
+    def get(self, digest):
+        """
+        Returns an archived body.
+
+        Args:
+            digest (str): The SHA-256 digest of the body.
+
+        Returns:
+            bytes: The raw body, or None if it is not archived.
+        """
+        row = self.connection.execute("SELECT codec FROM objects WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        with open(self.object_path(digest), 'rb') as file:
+            return decompress(file.read(), row[0])
+
+    def latest(self, kind=None):
+        """
+        Returns the latest archived fetch of every URL.
+
+        Args:
+            kind (str, optional): Restricts the result to ``listing`` or ``product`` pages.
+
+        Returns:
+            list: ``(url, kind, category, fetched_at, digest, codec)`` tuples, ordered by URL.
+        """
+        query = (
+            "SELECT f.url, f.kind, f.category, MAX(f.fetched_at), f.digest, o.codec "
+            "FROM fetches f JOIN objects o ON o.digest = f.digest"
+        )
+        params = ()
+        if kind is not None:
+            query += " WHERE f.kind = ?"
+            params = (kind,)
+        query += " GROUP BY f.url ORDER BY f.url"
+        return self.connection.execute(query, params).fetchall()
+
+    def history(self, url):
+        """
+        Returns every archived fetch of a URL, oldest first.
+
+        Returns:
+            list: ``(fetched_at, digest)`` pairs.
+        """
+        return self.connection.execute(
+            "SELECT fetched_at, digest FROM fetches WHERE url = ? ORDER BY fetched_at", (url,)
+        ).fetchall()
+
+    def stats(self):
+        """
+        Returns the number of fetches and objects and the raw and stored sizes in bytes.
+        """
+        fetches = self.connection.execute("SELECT COUNT(*) FROM fetches").fetchone()[0]
+        objects, size, stored_size = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM objects"
+        ).fetchone()
+        return {"fetches": fetches, "objects": objects, "size": size, "stored_size": stored_size}
+
+    def close(self):
+        """
+        Waits for pages still being archived, then closes the underlying index connection.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.connection.close()
+
+
+def extract_archived(entry):
+    """
+    Extracts the products of an archived product page in a worker process.
+
+    Args:
+        entry (tuple): The object path, codec, URL and categories of the page.
+
+    Returns:
+        tuple: The URL, categories and extracted product data (None if the page has none).
+    """
+    from src.pipeline import extract_page
+
+    path, codec, url, categories = entry
+    with open(path, 'rb') as file:
+        body = decompress(file.read(), codec)
+    return url, categories, extract_page(body, url)
+
+
+def reextract(archive, workers=None):
+    """
+    Re-extracts the latest archived version of every product page, without any network access.
+
+    Pages are decompressed and extracted in a pool of worker processes, which
+    read the objects from disk themselves.
+
+    Args:
+        archive (ResponseArchive): The archive.
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Yields:
+        tuple: The URL, every category the product was found in (empty if none was
+            recorded) and extracted product data (None if the page has none) of every
+            archived product page, in URL order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from src.pipeline import worker_context, worker_options
+
+    entries = [(archive.object_path(digest), codec, url, archive.categories(url) or ([category] if category else []))
+               for url, _, category, _, digest, codec in archive.latest(PRODUCT)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=worker_context(), **worker_options()) as executor:
+        yield from executor.map(extract_archived, entries, chunksize=REEXTRACT_CHUNK_SIZE)
@@ -0,0 +1,313 @@
+import os
+import zlib
+import pickle
+import logging
+from src.item_extract import EXTRACTOR_VERSION
+
+# How long an extracted product is kept at all
+DEFAULT_TTL = 7 * 24 * 60 * 60
+# How long an extracted product's price and stock are trusted without revalidation
+DEFAULT_VOLATILE_TTL = 6 * 60 * 60
+# Maximum size of the cache directory in bytes before entries are evicted
+DEFAULT_SIZE_LIMIT = 2 ** 30
+
+
+class ProductCache:
+    """
+    A TTL-bound, size-limited and versioned cache of extracted products.
+
+    Every product is stored twice: the extracted record, kept for ``ttl`` seconds,
+    and a freshness marker, kept for the much shorter ``volatile_ttl``, after which
+    its price and stock levels can no longer be trusted. :meth:`get` only returns
+    fresh records, while :meth:`get_stale` lets an incremental crawl revalidate an
+    older record with a conditional GET instead of re-extracting it.
+
+    Keys include the extractor version, so records cached by an older
+    ``extract_product_data`` are never served. Raw product HTML can optionally be
+    cached compressed, so a version bump can re-extract without re-fetching.
+
+    The underlying diskcache handle is opened lazily per process, so an instance
+    created before forking workers never shares its SQLite connection.
+    """
+
+    def __init__(self, directory="./cache", ttl=DEFAULT_TTL, volatile_ttl=DEFAULT_VOLATILE_TTL,
+                 size_limit=DEFAULT_SIZE_LIMIT, version=EXTRACTOR_VERSION):
+        """
+        Args:
+            directory (str, optional): The cache directory.
+            ttl (float, optional): Seconds an extracted product is kept.
+            volatile_ttl (float, optional): Seconds an extracted product's price and stock are trusted.
+            size_limit (int, optional): Maximum size of the cache in bytes.
+            version (str, optional): The extractor version cached records must match.
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.volatile_ttl = min(volatile_ttl, ttl)
+        self.size_limit = size_limit
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.html_hits = 0
+        self.evictions = 0
+        self._cache = None
+        self._pid = None
+
+    @property
+    def cache(self):
+        """
+        diskcache.Cache: The underlying cache, opened on first use in each process.
+        """
+        if self._cache is None or self._pid != os.getpid():
+            import diskcache
+
+            self._cache = diskcache.Cache(
+                self.directory,
+                size_limit=self.size_limit,
+                eviction_policy='least-recently-stored',
+            )
+            self._pid = os.getpid()
+        return self._cache
+
+    def _product_key(self, url):
+        return f"product:{self.version}:{url}"
+
+    def _fresh_key(self, url):
+        return f"fresh:{self.version}:{url}"
+
+    @staticmethod
+    def _html_key(url):
+        return f"html:{url}"
+
+    def _set(self, key, value, expire):
+        # diskcache culls expired and over-limit entries while setting; count them as evictions
+        before = len(self.cache)
+        is_new = key not in self.cache
+        self.cache.set(key, value, expire=expire)
+        self.evictions += max(0, before + is_new - len(self.cache))
+
+    def get(self, url):
+        """
+        Returns a cached product if its price and stock are still fresh.
+
+        Args:
+            url (str): The cleaned product URL.
+
+        Returns:
+            list: The extracted product data, or None on a miss.
+        """
+        if self._fresh_key(url) in self.cache:
+            product_data = self.cache.get(self._product_key(url))
+            if product_data is not None:
+                self.hits += 1
+                return product_data
+        self.misses += 1
+        return None
+
+    def get_stale(self, url):
+        """
+        Returns a cached product regardless of whether its price and stock are fresh.
+
+        Args:
+            url (str): The cleaned product URL.
+
+        Returns:
+            list: The extracted product data, or None if it expired or was evicted.
+        """
+        product_data = self.cache.get(self._product_key(url))
+        if product_data is not None:
+            self.stale_hits += 1
+        return product_data
+
+    def set(self, url, product_data):
+        """
+        Caches an extracted product and marks its price and stock as fresh.
+
+        Args:
+            url (str): The cleaned product URL.
+            product_data (list): The extracted product data.
+        """
+        self._set(self._product_key(url), product_data, self.ttl)
+        self._set(self._fresh_key(url), True, self.volatile_ttl)
+
+    def touch(self, url):
+        """
+        Marks a cached product as fresh again, e.g. after a ``304 Not Modified``.
+
+        Args:
+            url (str): The cleaned product URL.
+        """
+        self._set(self._fresh_key(url), True, self.volatile_ttl)
+        self.cache.touch(self._product_key(url), expire=self.ttl)
+
+    def get_html(self, url):
+        """
+        Returns the cached raw HTML of a product page if it is still fresh.
+
+        Args:
+            url (str): The cleaned product URL.
+
+        Returns:
+            bytes: The raw HTML, or None on a miss.
+        """
+        compressed = self.cache.get(self._html_key(url))
+        if compressed is None:
+            return None
+        self.html_hits += 1
+        return zlib.decompress(compressed)
+
+    def set_html(self, url, body):
+        """
+        Caches the raw HTML of a product page, compressed, for as long as its prices are fresh.
+
+        Args:
+            url (str): The cleaned product URL.
+            body (bytes): The raw HTML.
+        """
+        self._set(self._html_key(url), zlib.compress(body), self.volatile_ttl)
+
+    def stats(self):
+        """
+        Returns the cache counters of this process.
+
+        Returns:
+            dict: Hits, misses, stale hits, HTML hits, evictions, entry count and size in bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "html_hits": self.html_hits,
+            "evictions": self.evictions,
+            "entries": len(self.cache),
+            "size": self.cache.volume(),
+        }
+
+    def log_stats(self):
+        """
+        Logs the cache counters of this process.
+        """
+        logging.info("Cache stats: " + ", ".join(f"{name}={value}" for name, value in self.stats().items()))
+
+    def close(self):
+        """
+        Closes the underlying cache handle of this process.
+        """
+        if self._cache is not None and self._pid == os.getpid():
+            self._cache.close()
+        self._cache = None
+
+
+class RedisStore:
+    """
+    The few diskcache operations :class:`ProductCache` uses, on top of Redis.
+
+    Values are pickled like diskcache does, and expire through Redis's own key
+    expiry, so every node sharing the server sees the same entries and TTLs.
+    """
+
+    def __init__(self, client, prefix):
+        """
+        Args:
+            client (redis.Redis): The Redis client.
+            prefix (str): The prefix of the cache's keys.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def __contains__(self, key):
+        return bool(self.client.exists(self.prefix + key))
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*', count=1000))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, expire=None):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                        px=None if expire is None else int(expire * 1000))
+
+    def touch(self, key, expire=None):
+        if expire is None:
+            return bool(self.client.persist(self.prefix + key))
+        return bool(self.client.pexpire(self.prefix + key, int(expire * 1000)))
+
+    def close(self):
+        self.client.close()
+
+
+class RedisProductCache(ProductCache):
+    """
+    A :class:`ProductCache` kept in Redis, shared by workers on any number of machines.
+
+    A product extracted by one node is served from the cache to every other node,
+    so a distributed crawl fetches each product once per freshness window rather
+    than once per node. Redis evicts according to its own ``maxmemory`` policy, so
+    no size limit applies here. Requires the ``redis`` package.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", name="neiman", client=None, **options):
+        """
+        Args:
+            url (str, optional): The Redis URL.
+            name (str, optional): The prefix of the cache's keys.
+            client (redis.Redis, optional): The Redis client. Created from ``url`` in each process if not given.
+            **options: Options passed to :class:`ProductCache`, e.g. ``ttl``.
+        """
+        super().__init__(url, **options)
+        self.url = url
+        self.prefix = f"{name}:cache:"
+        self.client = client
+
+    @property
+    def cache(self):
+        """
+        RedisStore: The cache's keys in Redis, connected on first use in each process.
+        """
+        if self._cache is None or self._pid != os.getpid():
+            client = self.client
+            if client is None:
+                import redis
+
+                client = redis.Redis.from_url(self.url)
+            self._cache = RedisStore(client, self.prefix)
+            self._pid = os.getpid()
+        return self._cache
+
+    def _set(self, key, value, expire):
+        # Redis evicts on its own, so there is nothing to count
+        self.cache.set(key, value, expire=expire)
+
+    def stats(self):
+        """
+        Returns the cache counters of this process.
+
+        Returns:
+            dict: Hits, misses, stale hits, HTML hits and the entry count shared by all nodes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "html_hits": self.html_hits,
+            "entries": len(self.cache),
+        }
+
+
+def open_cache(location="./cache", **options):
+    """
+    Opens a product cache from a folder or a URL.
+
+    Args:
+        location (str, optional): ``redis://host:port/db`` for a :class:`RedisProductCache`
+            shared across machines, or a folder for a local :class:`ProductCache`.
+        **options: Options passed to the cache, e.g. ``ttl``.
+
+    Returns:
+        ProductCache or RedisProductCache: The cache.
+    """
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisProductCache(url=location, **options)
+    return ProductCache(location, **options)
@@ -0,0 +1,43 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# Locale prefix of a path, e.g. "/en-id" in "/en-id/p/plate-prod123"
+LOCALE_PREFIX = re.compile(r'^/[a-z]{2}-[a-z]{2}(?=/)', re.IGNORECASE)
+# Product ID embedded in a product path, e.g. "prod203145566"
+PRODUCT_ID = re.compile(r'(?<![a-z0-9])(prod\d+)', re.IGNORECASE)
+
+
+def canonical_url(url):
+    """
+    Normalizes a URL so variants of the same page compare equal.
+
+    Lowercases the scheme and host, drops the query string, fragment, locale
+    prefix (``/en-id/``) and trailing slash.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The canonical URL.
+    """
+    parts = urlsplit(url)
+    path = LOCALE_PREFIX.sub('', parts.path).rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+
+def product_key(url):
+    """
+    Returns the identity of the product behind a product page URL.
+
+    Args:
+        url (str): The product page URL.
+
+    Returns:
+        str: The product ID embedded in the path (``prod123``), or the canonical URL
+            when the path has none.
+    """
+    match = PRODUCT_ID.search(urlsplit(url).path)
+    if match:
+        return match.group(1).lower()
+    return canonical_url(url)
+
@@ -1,12 +1,36 @@
-import requests
 import xml.etree.ElementTree as ET
+import io
 import json
 import gzip
-from io import BytesIO
-from src.utils import json_category
+import queue
+import asyncio
+import logging
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from src.writer import JsonLinesWriter
+from src.fetch_state import FetchStateStore
+from src.canonical import canonical_url
+from src.scheduler import RequestScheduler
+from src.metrics import metrics, SITEMAP_FETCH
+
+CATEGORY_SITEMAPS = ["https://www.neimanmarcus.com/sitemap_category_1.xml.gz"]
+# Number of sitemaps downloaded and parsed at the same time
+DEFAULT_SITEMAP_WORKERS = 4
+# Maximum number of parsed records waiting to be consumed
+SITEMAP_QUEUE_SIZE = 1000
+SITEMAP_NAMESPACE = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+GZIP_MAGIC = b'\x1f\x8b'
 
 class CategoryScraper:
-    def __init__(self):
+    def __init__(self, incremental=False, state=None, scheduler=None):
+        """
+        Args:
+            incremental (bool, optional): Whether to return only the categories whose
+                ``lastmod`` changed since their last completed crawl.
+            state (FetchStateStore, optional): The freshness state used in incremental mode.
+            scheduler (RequestScheduler, optional): The scheduler pacing and retrying requests.
+        """
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36'
         }
@@ -16,36 +40,197 @@ class CategoryScraper:
             'xhtml': 'http://www.w3.org/1999/xhtml',
             'video': 'http://www.google.com/schemas/sitemap-video/1.1'
         }
+        self.incremental = incremental
+        self.state = state if state is not None or not incremental else FetchStateStore()
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
 
     def get_xml_content(self, url):
-        response = requests.get(url, headers=self.headers)
-        if response.headers.get('Content-Encoding') == 'gzip':
-            compressed_file = BytesIO(response.content)
-            with gzip.open(compressed_file, 'rb') as f:
-                return f.read()
-        return response.content
+        # requests already undoes Content-Encoding; .xml.gz files are still gzip payloads
+        with metrics.timer(SITEMAP_FETCH):
+            response = self.scheduler.fetch_sync(url, headers=self.headers)
+        if response.body[:2] == GZIP_MAGIC:
+            return gzip.decompress(response.body)
+        return response.body
+
+    def iter_xml(self, stream):
+        """
+        Incrementally parses a sitemap or sitemap index, keeping memory flat.
+
+        Args:
+            stream (file-like): The uncompressed XML.
+
+        Yields:
+            tuple: ``("url", record)`` for each page of a sitemap, or ``("sitemap", record)``
+                for each child sitemap of a sitemap index, where ``record`` is a dictionary
+                with ``URL`` and ``LastModified`` keys.
+        """
+        root = None
+        for event, element in ET.iterparse(stream, events=('start', 'end')):
+            if root is None:
+                root = element
+                continue
+            if event != 'end' or element.tag not in (SITEMAP_NAMESPACE + 'url', SITEMAP_NAMESPACE + 'sitemap'):
+                continue
+            loc = element.find(SITEMAP_NAMESPACE + 'loc')
+            lastmod = element.find(SITEMAP_NAMESPACE + 'lastmod')
+            if loc is not None and loc.text:
+                kind = 'url' if element.tag == SITEMAP_NAMESPACE + 'url' else 'sitemap'
+                yield kind, {
+                    "URL": loc.text.strip(),
+                    "LastModified": lastmod.text if lastmod is not None else None
+                }
+            # Drop parsed entries so the tree never grows past one element
+            root.clear()
 
     def parse_xml(self, xml_content):
-        root = ET.fromstring(xml_content)
-        data = []
-        for url in root.findall('sit:url', self.namespaces):
-            loc = url.find('sit:loc', self.namespaces).text
-            lastmod = url.find('sit:lastmod', self.namespaces)
-            lastmod = lastmod.text if lastmod is not None else None
-            data.append({
-                "URL": loc,
-                "LastModified": lastmod
-            })
-        return data
-
-    def get_categories(self):
-        url_sitemap = ["https://www.neimanmarcus.com/sitemap_category_1.xml.gz"]
-        all_data = []
-
-        for url in url_sitemap:
-            xml_content = self.get_xml_content(url)
-            data = self.parse_xml(xml_content)
-            all_data.extend(data)
-
-        json_category(all_data, 'category.json', 'data')
-        return json.dumps(all_data)
\ No newline at end of file
+        return [record for kind, record in self.iter_xml(io.BytesIO(xml_content)) if kind == 'url']
+
+    def iter_sitemap(self, url):
+        """
+        Streams one sitemap or sitemap index, decompressing it on the fly if it is gzipped.
+
+        Args:
+            url (str): The sitemap URL.
+
+        Yields:
+            tuple: The entries produced by :meth:`iter_xml`.
+        """
+        with metrics.timer(SITEMAP_FETCH):
+            response = self.scheduler.fetch_sync(url, headers=self.headers, stream=True)
+        try:
+            stream = io.BufferedReader(response.body)
+            if stream.peek(2)[:2] == GZIP_MAGIC:
+                stream = gzip.GzipFile(fileobj=stream)
+            yield from self.iter_xml(stream)
+        finally:
+            response.body.close()
+
+    def iter_sitemaps(self, urls, workers=DEFAULT_SITEMAP_WORKERS, failed=None):
+        """
+        Streams the page records of several sitemaps, fetched and parsed concurrently.
+
+        Sitemap indexes are followed recursively. Records pass through a bounded queue,
+        so memory stays flat however large the sitemaps are. A sitemap that cannot be
+        read is logged and skipped.
+
+        Args:
+            urls (list): Sitemap or sitemap index URLs.
+            workers (int, optional): Number of sitemaps processed at the same time.
+            failed (list, optional): Collects the URLs of the sitemaps that could not be read,
+                so callers can tell a complete listing from a partial one.
+
+        Yields:
+            dict: Records with ``URL`` and ``LastModified`` keys, in no particular order.
+        """
+        records = queue.Queue(maxsize=SITEMAP_QUEUE_SIZE)
+        stopped = threading.Event()
+        finished_marker = object()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        submitted_lock = threading.Lock()
+        submitted = 0
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    records.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def submit(url):
+            nonlocal submitted
+            with submitted_lock:
+                submitted += 1
+            executor.submit(work, url)
+
+        def work(url):
+            try:
+                for kind, record in self.iter_sitemap(url):
+                    if stopped.is_set():
+                        return
+                    if kind == 'sitemap':
+                        submit(record["URL"])
+                    else:
+                        put(record)
+            except Exception as e:
+                logging.error(f"Error reading sitemap {url}: {e}")
+                if failed is not None:
+                    failed.append(url)
+            finally:
+                put(finished_marker)
+
+        for url in urls:
+            submit(url)
+        finished = 0
+        try:
+            while finished < submitted:
+                item = records.get()
+                if item is finished_marker:
+                    finished += 1
+                else:
+                    yield item
+        finally:
+            stopped.set()
+            executor.shutdown(wait=False)
+
+    async def aiter_sitemaps(self, urls, batch_size=500, workers=DEFAULT_SITEMAP_WORKERS, failed=None):
+        """
+        Asynchronously streams sitemap page records in batches without blocking the event loop.
+
+        Args:
+            urls (list): Sitemap or sitemap index URLs.
+            batch_size (int, optional): Maximum number of records per batch.
+            workers (int, optional): Number of sitemaps processed at the same time.
+            failed (list, optional): Collects the URLs of the sitemaps that could not be read.
+
+        Yields:
+            list: Batches of records with ``URL`` and ``LastModified`` keys.
+        """
+        loop = asyncio.get_running_loop()
+        records = self.iter_sitemaps(urls, workers, failed)
+        try:
+            while batch := await loop.run_in_executor(None, lambda: list(islice(records, batch_size))):
+                yield batch
+        finally:
+            try:
+                records.close()
+            except ValueError:
+                # Still running in an executor thread after a cancellation
+                pass
+
+    def iter_categories(self, url_sitemap=None):
+        """
+        Streams category records from the category sitemaps and saves them as they arrive.
+
+        In incremental mode only the categories whose ``lastmod`` changed are yielded.
+
+        Args:
+            url_sitemap (list, optional): Sitemap or sitemap index URLs. Defaults to the
+                Neiman Marcus category sitemap.
+
+        Yields:
+            dict: Records with ``URL`` and ``LastModified`` keys.
+        """
+        with JsonLinesWriter('category.jsonl', 'data', key='URL') as writer:
+            for record in self.iter_sitemaps(url_sitemap or CATEGORY_SITEMAPS):
+                writer.write(record)
+                if not self.incremental or not self.state.is_unchanged(canonical_url(record["URL"]), record["LastModified"]):
+                    yield record
+
+    def get_categories(self, url_sitemap=None):
+        return json.dumps(list(self.iter_categories(url_sitemap)))
+
+    def changed(self, entries):
+        """
+        Filters sitemap entries down to those whose ``lastmod`` changed since the last crawl.
+
+        Entries are only marked as crawled by the caller once their crawl completes,
+        e.g. by ``MainScraper.main`` in incremental mode.
+
+        Args:
+            entries (list): Dictionaries with ``URL`` and ``LastModified`` keys.
+
+        Returns:
+            list: The entries that are new or modified.
+        """
+        return [entry for entry in entries if not self.state.is_unchanged(canonical_url(entry["URL"]), entry["LastModified"])]
\ No newline at end of file
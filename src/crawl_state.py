@@ -0,0 +1,259 @@
+import time
+from src.sqlite_store import SQLiteStore
+
+# Number of failed attempts after which a URL is no longer retried on resume
+DEFAULT_MAX_ATTEMPTS = 3
+
+LISTING = 'listing'
+PRODUCT = 'product'
+
+
+class CrawlState(SQLiteStore):
+    """
+    A persistent crawl frontier so a run can be stopped and resumed where it left off.
+
+    For each category it records which listing pages were parsed, every product
+    URL discovered so far with its status (``pending``, ``done`` or ``failed``),
+    and whether pagination completed. Several categories, and several scrapers,
+    can share one state file. Once a category is fully crawled its frontier is
+    cleared, so the next run starts fresh, and its failures move to a log table.
+    Each category also remembers the history run its crawl started in, since a
+    resumed crawl only sees the products that were still pending.
+    """
+
+    def __init__(self, path="./state/crawl_state.db", max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            path (str, optional): The path of the SQLite database file.
+            max_attempts (int, optional): Number of failed attempts after which a URL is given up.
+        """
+        super().__init__(
+            path,
+            "CREATE TABLE IF NOT EXISTS categories ("
+            "  category TEXT PRIMARY KEY, listing_done INTEGER NOT NULL DEFAULT 0, started_at REAL, run_id INTEGER);"
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "  category TEXT NOT NULL, url TEXT NOT NULL, kind TEXT NOT NULL,"
+            "  status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0,"
+            "  error TEXT, lastmod TEXT, updated_at REAL, PRIMARY KEY (category, url));"
+            "CREATE INDEX IF NOT EXISTS frontier_status ON frontier (category, kind, status);"
+            "CREATE TABLE IF NOT EXISTS failures ("
+            "  category TEXT NOT NULL, url TEXT NOT NULL, kind TEXT NOT NULL,"
+            "  attempts INTEGER, error TEXT, failed_at REAL);",
+        )
+        self.max_attempts = max_attempts
+        # State files written before categories remembered their starting run
+        if 'run_id' not in {row[1] for row in self.connection.execute("PRAGMA table_info(categories)")}:
+            self.connection.execute("ALTER TABLE categories ADD COLUMN run_id INTEGER")
+
+    def start_category(self, category, run_id=None):
+        """
+        Registers a category, keeping its progress if it is being resumed.
+
+        Args:
+            category (str): The category URL.
+            run_id (int, optional): The current history run, kept as the run the crawl started in.
+
+        Returns:
+            bool: True if the category already had progress to resume.
+        """
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO categories (category, started_at, run_id) VALUES (?, ?, ?)",
+            (category, time.time(), run_id),
+        )
+        return cursor.rowcount == 0
+
+    def started_run(self, category):
+        """
+        Returns the history run a category's crawl started in.
+
+        Returns:
+            int: The run ID, or None if the crawl started without a history.
+        """
+        row = self.connection.execute("SELECT run_id FROM categories WHERE category = ?", (category,)).fetchone()
+        return row[0] if row else None
+
+    def categories(self):
+        """
+        Lists the categories whose crawl has started but not finished.
+
+        Returns:
+            list: The category URLs, oldest first.
+        """
+        return [row[0] for row in self.connection.execute("SELECT category FROM categories ORDER BY started_at")]
+
+    def listing_done(self, category):
+        """
+        Checks whether every listing page of a category was parsed.
+        """
+        row = self.connection.execute("SELECT listing_done FROM categories WHERE category = ?", (category,)).fetchone()
+        return bool(row and row[0])
+
+    def set_listing_done(self, category):
+        """
+        Records that every listing page of a category was parsed.
+        """
+        self.connection.execute("UPDATE categories SET listing_done = 1 WHERE category = ?", (category,))
+
+    def add_products(self, category, urls):
+        """
+        Adds product URLs to a category's frontier.
+
+        Args:
+            category (str): The category URL.
+            urls (iterable): The product URLs.
+
+        Returns:
+            list: The given URLs that still need to be crawled.
+        """
+        return [url for url, _ in self.add_product_entries(category, ((url, None) for url in urls))]
+
+    def add_product_entries(self, category, entries):
+        """
+        Adds product URLs with their sitemap ``lastmod`` values to a category's frontier.
+
+        Args:
+            category (str): The category URL.
+            entries (iterable): ``(url, lastmod)`` pairs.
+
+        Returns:
+            list: The given pairs whose URL still needs to be crawled.
+        """
+        entries = list(entries)
+        urls = [url for url, _ in entries]
+        now = time.time()
+        finished = set()
+        with self.transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO frontier (category, url, kind, lastmod, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(category, url, PRODUCT, lastmod, now) for url, lastmod in entries],
+            )
+            for start in range(0, len(urls), 500):
+                chunk = urls[start:start + 500]
+                placeholders = ', '.join('?' for _ in chunk)
+                finished.update(row[0] for row in connection.execute(
+                    f"SELECT url FROM frontier WHERE category = ? AND url IN ({placeholders}) "
+                    "AND (status = 'done' OR (status = 'failed' AND attempts >= ?))",
+                    (category, *chunk, self.max_attempts),
+                ))
+        return [(url, lastmod) for url, lastmod in entries if url not in finished]
+
+    def urls(self, category, kind, statuses):
+        """
+        Returns a category's frontier URLs of a given kind and status.
+
+        Args:
+            category (str): The category URL.
+            kind (str): ``listing`` or ``product``.
+            statuses (tuple): The statuses to include.
+
+        Returns:
+            set: The matching URLs.
+        """
+        placeholders = ', '.join('?' for _ in statuses)
+        return {row[0] for row in self.connection.execute(
+            f"SELECT url FROM frontier WHERE category = ? AND kind = ? AND status IN ({placeholders})",
+            (category, kind, *statuses),
+        )}
+
+    def given_up(self, category, kind):
+        """
+        Returns the URLs of a category that failed too often to be retried.
+
+        Args:
+            category (str): The category URL.
+            kind (str): ``listing`` or ``product``.
+
+        Returns:
+            set: The URLs that reached the maximum number of attempts.
+        """
+        return {row[0] for row in self.connection.execute(
+            "SELECT url FROM frontier WHERE category = ? AND kind = ? AND status = 'failed' AND attempts >= ?",
+            (category, kind, self.max_attempts),
+        )}
+
+    def has_failures(self, category):
+        """
+        Checks whether any listing page or product of a category failed, in this run or an earlier one.
+        """
+        return self.connection.execute(
+            "SELECT 1 FROM frontier WHERE category = ? AND status = 'failed' LIMIT 1", (category,)
+        ).fetchone() is not None
+
+    def pending_products(self, category):
+        """
+        Returns the product URLs of a category that still need to be crawled.
+
+        Failed products are included until they reach the maximum number of attempts.
+
+        Args:
+            category (str): The category URL.
+
+        Returns:
+            list: The pending product URLs.
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT url FROM frontier WHERE category = ? AND kind = ? "
+            "AND (status = 'pending' OR (status = 'failed' AND attempts < ?))",
+            (category, PRODUCT, self.max_attempts),
+        )]
+
+    def mark_done(self, category, url, kind=PRODUCT):
+        """
+        Records that a listing page or product was crawled successfully.
+        """
+        self.connection.execute(
+            "INSERT INTO frontier (category, url, kind, status, updated_at) VALUES (?, ?, ?, 'done', ?) "
+            "ON CONFLICT(category, url) DO UPDATE SET status = 'done', error = NULL, updated_at = excluded.updated_at",
+            (category, url, kind, time.time()),
+        )
+
+    def mark_failed(self, category, url, error, kind=PRODUCT):
+        """
+        Records a failed attempt at crawling a listing page or product.
+
+        Returns:
+            bool: True if the URL reached the maximum number of attempts and is given up.
+        """
+        rows = self.connection.execute(
+            "INSERT INTO frontier (category, url, kind, status, attempts, error, updated_at) "
+            "VALUES (?, ?, ?, 'failed', 1, ?, ?) "
+            "ON CONFLICT(category, url) DO UPDATE SET status = 'failed', attempts = attempts + 1, "
+            "error = excluded.error, updated_at = excluded.updated_at RETURNING attempts",
+            (category, url, kind, str(error), time.time()),
+        ).fetchall()
+        return rows[0][0] >= self.max_attempts
+
+    def failures(self, category=None):
+        """
+        Returns the logged failures of finished categories.
+
+        Args:
+            category (str, optional): Restricts the result to one category.
+
+        Returns:
+            list: Dictionaries with ``category``, ``url``, ``kind``, ``attempts``, ``error`` and ``failed_at``.
+        """
+        query = "SELECT category, url, kind, attempts, error, failed_at FROM failures"
+        params = ()
+        if category is not None:
+            query += " WHERE category = ?"
+            params = (category,)
+        columns = ('category', 'url', 'kind', 'attempts', 'error', 'failed_at')
+        return [dict(zip(columns, row)) for row in self.connection.execute(query, params)]
+
+    def finish_category(self, category):
+        """
+        Clears a fully crawled category's frontier, keeping its failures in the log.
+
+        Args:
+            category (str): The category URL.
+        """
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO failures (category, url, kind, attempts, error, failed_at) "
+                "SELECT category, url, kind, attempts, error, updated_at FROM frontier "
+                "WHERE category = ? AND status = 'failed'",
+                (category,),
+            )
+            connection.execute("DELETE FROM frontier WHERE category = ?", (category,))
+            connection.execute("DELETE FROM categories WHERE category = ?", (category,))
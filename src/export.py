@@ -0,0 +1,199 @@
+import os
+import csv
+from itertools import islice
+from src.models import Product, PRODUCT_COLUMNS, SKU_COLUMNS
+from src.writer import iter_json_lines, latest_records
+
+# Number of products converted per Parquet row group
+DEFAULT_BATCH_SIZE = 5000
+# Separator of list values (sizes, colors, images) in CSV cells
+LIST_SEPARATOR = '|'
+FORMATS = ('parquet', 'csv')
+
+
+def iter_products(file_path, latest_only=False):
+    """
+    Lazily reads typed products from a JSON Lines output file.
+
+    Args:
+        file_path (str): The path of the JSON Lines file (.jsonl or .jsonl.gz).
+        latest_only (bool, optional): Whether to keep only the latest record per product ID.
+
+    Yields:
+        Product: The products in the order they were written.
+    """
+    records = iter_json_lines(file_path)
+    if latest_only:
+        records = latest_records(records)
+    for record in records:
+        yield Product.from_record(record)
+
+
+def output_paths(file_path, output_dir, extension):
+    """
+    Returns the paths of the products and SKUs tables exported from a JSON Lines file.
+    """
+    base_path = file_path[:-3] if file_path.endswith('.gz') else file_path
+    base_name = os.path.splitext(os.path.basename(base_path))[0]
+    output_dir = output_dir or os.path.dirname(base_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    return (
+        os.path.join(output_dir, f'{base_name}.products.{extension}'),
+        os.path.join(output_dir, f'{base_name}.skus.{extension}'),
+    )
+
+
+def export_csv(products, products_path, skus_path):
+    """
+    Streams products into two CSV files, one row per product and one row per SKU.
+
+    List fields are joined with ``|``; missing values are left empty.
+
+    Args:
+        products (iterable): The :class:`Product` objects to export.
+        products_path (str): The path of the products CSV file.
+        skus_path (str): The path of the SKUs CSV file.
+
+    Returns:
+        tuple: The number of products and SKUs written.
+    """
+    product_count = sku_count = 0
+    with open(products_path, 'w', encoding='utf-8', newline='') as products_file, \
+            open(skus_path, 'w', encoding='utf-8', newline='') as skus_file:
+        products_writer = csv.writer(products_file)
+        skus_writer = csv.writer(skus_file)
+        products_writer.writerow(PRODUCT_COLUMNS)
+        skus_writer.writerow(SKU_COLUMNS)
+        for product in products:
+            row = []
+            for column in PRODUCT_COLUMNS:
+                value = getattr(product, column)
+                row.append(LIST_SEPARATOR.join(value) if isinstance(value, list) else value)
+            products_writer.writerow(row)
+            skus_writer.writerows([getattr(sku, column) for column in SKU_COLUMNS] for sku in product.skus)
+            product_count += 1
+            sku_count += len(product.skus)
+    return product_count, sku_count
+
+
+def arrow_schemas():
+    """
+    Returns the Arrow schemas of the products and SKUs tables.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    products_schema = pa.schema([
+        ('id', pa.string()),
+        ('url', pa.string()),
+        ('name', pa.string()),
+        ('brand', pa.string()),
+        ('category', pa.string()),
+        ('description', pa.string()),
+        ('currency', pa.string()),
+        ('price', pa.float64()),
+        ('sizes', pa.list_(pa.string())),
+        ('colors', pa.list_(pa.string())),
+        ('images', pa.list_(pa.string())),
+    ])
+    skus_schema = pa.schema([
+        ('id', pa.string()),
+        ('product_id', pa.string()),
+        ('status', pa.string()),
+        ('color', pa.string()),
+        ('size', pa.string()),
+        ('stock', pa.int64()),
+        ('image_url', pa.string()),
+    ])
+    return products_schema, skus_schema
+
+
+def export_parquet(products, products_path, skus_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Streams products into two Parquet files, writing one row group per batch.
+
+    Only one batch of products is held in memory at a time.
+
+    Args:
+        products (iterable): The :class:`Product` objects to export.
+        products_path (str): The path of the products Parquet file.
+        skus_path (str): The path of the SKUs Parquet file.
+        batch_size (int, optional): Number of products per row group.
+
+    Returns:
+        tuple: The number of products and SKUs written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    products_schema, skus_schema = arrow_schemas()
+    product_count = sku_count = 0
+    products = iter(products)
+    with pq.ParquetWriter(products_path, products_schema) as products_writer, \
+            pq.ParquetWriter(skus_path, skus_schema) as skus_writer:
+        while True:
+            batch = list(islice(products, batch_size))
+            if not batch:
+                break
+            skus = [sku for product in batch for sku in product.skus]
+            products_writer.write_table(pa.Table.from_pydict(
+                {column: [getattr(product, column) for product in batch] for column in PRODUCT_COLUMNS},
+                schema=products_schema,
+            ))
+            skus_writer.write_table(pa.Table.from_pydict(
+                {column: [getattr(sku, column) for sku in skus] for column in SKU_COLUMNS},
+                schema=skus_schema,
+            ))
+            product_count += len(batch)
+            sku_count += len(skus)
+    return product_count, sku_count
+
+
+def export_columnar(file_path, output_format='parquet', output_dir=None, latest_only=False):
+    """
+    Exports a JSON Lines output file to separate products and SKUs tables.
+
+    Args:
+        file_path (str): The path of the JSON Lines file (.jsonl or .jsonl.gz).
+        output_format (str, optional): ``parquet`` (requires pyarrow) or ``csv``.
+        output_dir (str, optional): The folder of the exported files. Defaults to the
+            folder of the input file.
+        latest_only (bool, optional): Whether to keep only the latest record per product ID.
+
+    Returns:
+        tuple: The paths of the products and SKUs tables.
+
+    Raises:
+        ValueError: If the output format is not supported.
+        ImportError: If the Parquet format is requested and pyarrow is not installed.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unsupported export format: {output_format}")
+    products_path, skus_path = output_paths(file_path, output_dir, output_format)
+    products = iter_products(file_path, latest_only)
+    if output_format == 'parquet':
+        product_count, sku_count = export_parquet(products, products_path, skus_path)
+    else:
+        product_count, sku_count = export_csv(products, products_path, skus_path)
+    print(f'Data saved to {products_path} ({product_count} products) and {skus_path} ({sku_count} SKUs)')
+    return products_path, skus_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export JSON Lines output files to product and SKU tables.")
+    parser.add_argument('paths', nargs='+', help="JSON Lines files (.jsonl or .jsonl.gz)")
+    parser.add_argument('--format', choices=FORMATS, default='parquet', help="Output format")
+    parser.add_argument('--output-dir', help="Folder of the exported files")
+    parser.add_argument('--latest-only', action='store_true', help="Export only the latest record per product ID")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        export_columnar(path, args.format, args.output_dir, args.latest_only)
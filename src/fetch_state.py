@@ -0,0 +1,107 @@
+import time
+from src.sqlite_store import SQLiteStore
+
+
+class FetchStateStore(SQLiteStore):
+    """
+    A persistent store of per-URL freshness state used by incremental crawls.
+
+    For every URL it keeps the sitemap ``lastmod`` value and the ``ETag`` and
+    ``Last-Modified`` response headers of the last successful fetch, so a later
+    run can skip unchanged URLs or revalidate them with a conditional GET.
+    """
+
+    def __init__(self, path="./state/fetch_state.db"):
+        """
+        Args:
+            path (str, optional): The path of the SQLite database file.
+        """
+        super().__init__(
+            path,
+            "CREATE TABLE IF NOT EXISTS fetch_state ("
+            "url TEXT PRIMARY KEY, lastmod TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)",
+        )
+
+    def get(self, url):
+        """
+        Returns the stored state of a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            dict: The ``lastmod``, ``etag``, ``last_modified`` and ``fetched_at`` values,
+                or None if the URL was never recorded.
+        """
+        row = self.connection.execute(
+            "SELECT lastmod, etag, last_modified, fetched_at FROM fetch_state WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('lastmod', 'etag', 'last_modified', 'fetched_at'), row))
+
+    def update(self, url, lastmod=None, etag=None, last_modified=None):
+        """
+        Records the state of a URL, keeping previously stored values that are not given.
+
+        Args:
+            url (str): The URL.
+            lastmod (str, optional): The sitemap ``lastmod`` value.
+            etag (str, optional): The ``ETag`` response header.
+            last_modified (str, optional): The ``Last-Modified`` response header.
+        """
+        self.connection.execute(
+            "INSERT INTO fetch_state (url, lastmod, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET "
+            "lastmod = COALESCE(excluded.lastmod, lastmod), "
+            "etag = COALESCE(excluded.etag, etag), "
+            "last_modified = COALESCE(excluded.last_modified, last_modified), "
+            "fetched_at = excluded.fetched_at",
+            (url, lastmod, etag, last_modified, time.time()),
+        )
+
+    def update_from_headers(self, url, headers, lastmod=None):
+        """
+        Records the validators found in a response's headers.
+
+        Args:
+            url (str): The URL.
+            headers (Mapping): The response headers.
+            lastmod (str, optional): The sitemap ``lastmod`` value.
+        """
+        self.update(url, lastmod=lastmod, etag=headers.get('ETag'), last_modified=headers.get('Last-Modified'))
+
+    def is_unchanged(self, url, lastmod):
+        """
+        Checks whether a URL's sitemap ``lastmod`` matches the one from the last run.
+
+        Args:
+            url (str): The URL.
+            lastmod (str): The current sitemap ``lastmod`` value.
+
+        Returns:
+            bool: True if both values are known and equal.
+        """
+        if not lastmod:
+            return False
+        state = self.get(url)
+        return state is not None and state['lastmod'] == lastmod
+
+    def conditional_headers(self, url):
+        """
+        Builds the conditional request headers for a URL.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            dict: ``If-None-Match`` and/or ``If-Modified-Since`` headers, empty if unknown.
+        """
+        state = self.get(url)
+        headers = {}
+        if state is not None:
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+        return headers
@@ -0,0 +1,216 @@
+import time
+from src.sqlite_store import SQLiteStore
+
+NEW_PRODUCT = 'new_product'
+REMOVED_PRODUCT = 'removed_product'
+PRICE_CHANGE = 'price'
+NEW_SKU = 'new_sku'
+REMOVED_SKU = 'removed_sku'
+STOCK_CHANGE = 'stock'
+STATUS_CHANGE = 'status'
+
+
+class HistoryStore(SQLiteStore):
+    """
+    A persistent history of product prices and SKU stock, keyed by product ID and SKU ID.
+
+    Every scraped product is compared with its last recorded state and only the
+    differences are returned: new and removed products and SKUs, price changes,
+    and stock level or status transitions. Every change is also kept in a
+    ``changes`` table, so the history of a product can be queried later.
+    """
+
+    def __init__(self, path="./state/history.db"):
+        """
+        Args:
+            path (str, optional): The path of the SQLite database file.
+        """
+        super().__init__(
+            path,
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "  run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL, finished_at REAL);"
+            "CREATE TABLE IF NOT EXISTS products ("
+            "  product_id TEXT PRIMARY KEY, url TEXT, currency TEXT, price REAL,"
+            "  active INTEGER NOT NULL DEFAULT 1, first_seen REAL, last_seen REAL, last_run INTEGER);"
+            "CREATE TABLE IF NOT EXISTS product_categories ("
+            "  product_id TEXT NOT NULL, category TEXT NOT NULL, PRIMARY KEY (product_id, category));"
+            "CREATE INDEX IF NOT EXISTS product_categories_category ON product_categories (category);"
+            "CREATE TABLE IF NOT EXISTS skus ("
+            "  product_id TEXT NOT NULL, sku_id TEXT NOT NULL, status TEXT, stock INTEGER,"
+            "  active INTEGER NOT NULL DEFAULT 1, last_seen REAL, PRIMARY KEY (product_id, sku_id));"
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "  run_id INTEGER, changed_at REAL, change TEXT NOT NULL, product_id TEXT NOT NULL,"
+            "  sku_id TEXT, old TEXT, new TEXT);"
+            "CREATE INDEX IF NOT EXISTS changes_product ON changes (product_id, changed_at);",
+        )
+        self.run_id = None
+
+    def start_run(self):
+        """
+        Starts a new run that subsequent changes are attributed to.
+
+        Returns:
+            int: The run ID.
+        """
+        cursor = self.connection.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def _change(self, connection, changes, now, change, product_id, sku_id=None, old=None, new=None):
+        connection.execute(
+            "INSERT INTO changes (run_id, changed_at, change, product_id, sku_id, old, new) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.run_id, now, change, product_id, sku_id,
+             None if old is None else str(old), None if new is None else str(new)),
+        )
+        changes.append({
+            "run_id": self.run_id, "change": change, "product_id": product_id,
+            "sku_id": sku_id, "old": old, "new": new,
+        })
+
+    def record(self, product, category=None):
+        """
+        Records the current state of a product and returns what changed since it was last seen.
+
+        Args:
+            product (Product): The scraped product.
+            category (str, optional): The category the product was found in.
+
+        Returns:
+            list: Dictionaries with ``run_id``, ``change``, ``product_id``, ``sku_id``,
+                ``old`` and ``new``; empty if nothing changed.
+        """
+        if self.run_id is None:
+            self.start_run()
+        now = time.time()
+        changes = []
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT currency, price, active FROM products WHERE product_id = ?", (product.id,)
+            ).fetchone()
+            if row is None or not row[2]:
+                self._change(connection, changes, now, NEW_PRODUCT, product.id, new=product.price)
+            elif (row[0], row[1]) != (product.currency, product.price):
+                self._change(connection, changes, now, PRICE_CHANGE, product.id, old=row[1], new=product.price)
+            connection.execute(
+                "INSERT INTO products (product_id, url, currency, price, active, first_seen, last_seen, last_run) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?, ?) "
+                "ON CONFLICT(product_id) DO UPDATE SET url = excluded.url, currency = excluded.currency, "
+                "price = excluded.price, active = 1, last_seen = excluded.last_seen, last_run = excluded.last_run",
+                (product.id, product.url, product.currency, product.price, now, now, self.run_id),
+            )
+            if category is not None:
+                connection.execute(
+                    "INSERT OR IGNORE INTO product_categories (product_id, category) VALUES (?, ?)",
+                    (product.id, category),
+                )
+
+            known = {sku_id: (status, stock) for sku_id, status, stock in connection.execute(
+                "SELECT sku_id, status, stock FROM skus WHERE product_id = ? AND active = 1", (product.id,)
+            )}
+            seen = set()
+            for sku in product.skus:
+                if sku.id is None or sku.id in seen:
+                    continue
+                seen.add(sku.id)
+                if sku.id not in known:
+                    self._change(connection, changes, now, NEW_SKU, product.id, sku.id, new=sku.stock)
+                else:
+                    status, stock = known[sku.id]
+                    if stock != sku.stock:
+                        self._change(connection, changes, now, STOCK_CHANGE, product.id, sku.id, stock, sku.stock)
+                    if status != sku.status:
+                        self._change(connection, changes, now, STATUS_CHANGE, product.id, sku.id, status, sku.status)
+                connection.execute(
+                    "INSERT INTO skus (product_id, sku_id, status, stock, active, last_seen) VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT(product_id, sku_id) DO UPDATE SET status = excluded.status, "
+                    "stock = excluded.stock, active = 1, last_seen = excluded.last_seen",
+                    (product.id, sku.id, sku.status, sku.stock, now),
+                )
+            for sku_id in known.keys() - seen:
+                self._change(connection, changes, now, REMOVED_SKU, product.id, sku_id, old=known[sku_id][1])
+                connection.execute(
+                    "UPDATE skus SET active = 0 WHERE product_id = ? AND sku_id = ?", (product.id, sku_id)
+                )
+        return changes
+
+    def finish_run(self, categories=()):
+        """
+        Ends the current run, marking products that disappeared from fully crawled categories as removed.
+
+        Only products found in the given categories by an earlier run and not seen
+        anywhere since the category's crawl started are removed, so partial or
+        skipped crawls never report removals, and a crawl finished by a later run
+        does not remove the products scraped before it was interrupted.
+
+        Args:
+            categories (dict or iterable, optional): The categories crawled completely during
+                this run, mapped to the run their crawl started in; a plain iterable means
+                this run.
+
+        Returns:
+            list: The removal changes, in the format returned by :meth:`record`.
+        """
+        if self.run_id is None:
+            return []
+        now = time.time()
+        changes = []
+        if not isinstance(categories, dict):
+            categories = dict.fromkeys(categories, self.run_id)
+        with self.transaction() as connection:
+            removed = []
+            for category, started_run in categories.items():
+                removed.extend(connection.execute(
+                    "SELECT p.product_id, p.price FROM products p "
+                    "JOIN product_categories c ON c.product_id = p.product_id "
+                    "WHERE c.category = ? AND p.active = 1 AND p.last_run < ?",
+                    (category, started_run),
+                ))
+            # A product in several removed categories is only removed once
+            for product_id, price in dict(removed).items():
+                self._change(connection, changes, now, REMOVED_PRODUCT, product_id, old=price)
+                connection.execute("UPDATE products SET active = 0 WHERE product_id = ?", (product_id,))
+                connection.execute("UPDATE skus SET active = 0 WHERE product_id = ?", (product_id,))
+            connection.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (now, self.run_id))
+        self.run_id = None
+        return changes
+
+    def categories(self, product_id):
+        """
+        Returns every category a product was found in, by any run.
+
+        Args:
+            product_id (str): The product ID.
+
+        Returns:
+            list: The category URLs, or ``sitemap:<name>`` for sitemap crawls.
+        """
+        return [row[0] for row in self.connection.execute(
+            "SELECT category FROM product_categories WHERE product_id = ? ORDER BY category", (product_id,)
+        )]
+
+    def changes(self, product_id=None, run_id=None):
+        """
+        Returns recorded changes, oldest first.
+
+        Args:
+            product_id (str, optional): Restricts the result to one product.
+            run_id (int, optional): Restricts the result to one run.
+
+        Returns:
+            list: Dictionaries with ``run_id``, ``changed_at``, ``change``, ``product_id``,
+                ``sku_id``, ``old`` and ``new``; ``old`` and ``new`` are stored as text.
+        """
+        query = "SELECT run_id, changed_at, change, product_id, sku_id, old, new FROM changes"
+        conditions = []
+        params = []
+        if product_id is not None:
+            conditions.append("product_id = ?")
+            params.append(product_id)
+        if run_id is not None:
+            conditions.append("run_id = ?")
+            params.append(run_id)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY rowid"
+        columns = ('run_id', 'changed_at', 'change', 'product_id', 'sku_id', 'old', 'new')
+        return [dict(zip(columns, row)) for row in self.connection.execute(query, params)]
@@ -0,0 +1,95 @@
+import re
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Opening tag of an embedded JSON script, e.g. <script id="__NEXT_DATA__" type="application/json">
+JSON_SCRIPT_OPEN = re.compile(
+    rb'<script\b[^>]*?\stype\s*=\s*(?:"application/json"|\'application/json\'|application/json(?=[\s>]))[^>]*>',
+    re.IGNORECASE,
+)
+SCRIPT_CLOSE = re.compile(rb'</script', re.IGNORECASE)
+
+
+def loads(data):
+    """
+    Decodes JSON with orjson when it is installed, falling back to the standard library.
+
+    Args:
+        data (bytes | str): The JSON document.
+
+    Returns:
+        object: The decoded JSON value.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def find_json_script(body):
+    """
+    Slices the text of the first non-empty ``application/json`` script out of raw HTML.
+
+    Args:
+        body (bytes): The raw HTML of the page.
+
+    Returns:
+        bytes: The stripped script text, or None if no such script was found.
+    """
+    position = 0
+    while match := JSON_SCRIPT_OPEN.search(body, position):
+        close = SCRIPT_CLOSE.search(body, match.end())
+        if close is None:
+            return None
+        script_content = body[match.end():close.start()].strip()
+        if script_content:
+            return script_content
+        position = close.end()
+    return None
+
+
+def extract_json_payload_dom(html):
+    """
+    Extracts the first ``application/json`` script by building the full lxml DOM.
+
+    Args:
+        html (bytes | str): The raw HTML of the page.
+
+    Returns:
+        object: The decoded JSON payload, or None if the page has no JSON script.
+    """
+    import lxml.html
+
+    tree = lxml.html.fromstring(html)
+    script_tag = tree.xpath('//script[@type="application/json"]/text()')
+    if script_tag:
+        return json.loads(script_tag[0].strip())
+    return None
+
+
+def extract_json_payload(body):
+    """
+    Extracts the embedded JSON payload of a product page.
+
+    The script is located and sliced directly from the response bytes; the full
+    DOM parse is only used when that fast path finds nothing or cannot decode it.
+
+    Args:
+        body (bytes): The raw HTML of the page.
+
+    Returns:
+        object: The decoded JSON payload, or None if the page has no JSON script.
+    """
+    script_content = find_json_script(body)
+    if script_content is not None:
+        try:
+            return loads(script_content)
+        except ValueError as e:
+            logging.debug(f"Fast JSON extraction failed, falling back to DOM parse: {e}")
+    if not body.strip():
+        return None
+    return extract_json_payload_dom(body)
@@ -0,0 +1,164 @@
+import re
+import importlib.util
+from urllib.parse import urljoin
+
+PAGE_NUMBER_PATTERN = re.compile(r'[?&]page=(\d+)')
+
+# XPath expressions matching the same class tokens BeautifulSoup's ``class_`` does
+PRODUCT_THUMBNAIL_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' product-thumbnail ')]"
+PRODUCT_LINK_XPATH = ".//a[contains(concat(' ', normalize-space(@class), ' '), ' product-thumbnail__link ')]"
+NEXT_PAGE_XPATH = "//a[contains(concat(' ', normalize-space(@class), ' '), ' arrow-button--right ')]"
+
+
+def last_page_number(hrefs):
+    """
+    Finds the highest ``page`` query parameter among the given links.
+
+    Args:
+        hrefs (iterable): The href values of the links on a listing page.
+
+    Returns:
+        int: The highest page number, or None if no link carries one.
+    """
+    page_numbers = [int(match.group(1)) for href in hrefs if (match := PAGE_NUMBER_PATTERN.search(href))]
+    return max(page_numbers) if page_numbers else None
+
+
+def extract_listing_bs4(content, base_url):
+    """
+    Extracts listing data using BeautifulSoup with the pure-Python ``html.parser``.
+
+    Args:
+        content (bytes): The raw HTML of the listing page.
+        base_url (str): The base URL used to resolve relative links.
+
+    Returns:
+        tuple: A tuple containing three elements:
+            - A list of product URLs found on the page.
+            - The URL for the next page, or None if there is no next page.
+            - The highest page number linked from the pagination, or None if unknown.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+
+    product_url_elements = soup.find_all('div', class_='product-thumbnail')
+    product_urls = [urljoin(base_url, link['href'])
+                    for product_element in product_url_elements
+                    if (link := product_element.find('a', class_='product-thumbnail__link')) and 'href' in link.attrs]
+
+    next_page_element = soup.find('a', class_='arrow-button--right')
+    next_page_url = urljoin(base_url, next_page_element['href']) if next_page_element else None
+
+    last_page = last_page_number(link['href'] for link in soup.find_all('a', href=True))
+
+    return product_urls, next_page_url, last_page
+
+
+def extract_listing_lxml(content, base_url):
+    """
+    Extracts listing data using lxml and XPath.
+
+    Args:
+        content (bytes): The raw HTML of the listing page.
+        base_url (str): The base URL used to resolve relative links.
+
+    Returns:
+        tuple: Same as :func:`extract_listing_bs4`.
+    """
+    import lxml.html
+
+    if not content or not content.strip():
+        return [], None, None
+    tree = lxml.html.fromstring(content)
+
+    product_urls = []
+    for product_element in tree.xpath(PRODUCT_THUMBNAIL_XPATH):
+        links = product_element.xpath(PRODUCT_LINK_XPATH)
+        if links and links[0].get('href') is not None:
+            product_urls.append(urljoin(base_url, links[0].get('href')))
+
+    next_page_elements = tree.xpath(NEXT_PAGE_XPATH)
+    next_page_href = next_page_elements[0].get('href') if next_page_elements else None
+    next_page_url = urljoin(base_url, next_page_href) if next_page_href is not None else None
+
+    last_page = last_page_number(tree.xpath('//a/@href'))
+
+    return product_urls, next_page_url, last_page
+
+
+def extract_listing_selectolax(content, base_url):
+    """
+    Extracts listing data using selectolax's Lexbor backend.
+
+    Args:
+        content (bytes): The raw HTML of the listing page.
+        base_url (str): The base URL used to resolve relative links.
+
+    Returns:
+        tuple: Same as :func:`extract_listing_bs4`.
+    """
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(content)
+
+    product_urls = []
+    for product_element in tree.css('div.product-thumbnail'):
+        link = product_element.css_first('a.product-thumbnail__link')
+        if link is not None and 'href' in link.attributes:
+            product_urls.append(urljoin(base_url, link.attributes['href']))
+
+    next_page_element = tree.css_first('a.arrow-button--right')
+    next_page_href = next_page_element.attributes.get('href') if next_page_element is not None else None
+    next_page_url = urljoin(base_url, next_page_href) if next_page_href is not None else None
+
+    last_page = last_page_number(link.attributes['href'] for link in tree.css('a[href]'))
+
+    return product_urls, next_page_url, last_page
+
+
+LISTING_EXTRACTORS = {
+    'bs4': extract_listing_bs4,
+    'lxml': extract_listing_lxml,
+    'selectolax': extract_listing_selectolax,
+}
+
+
+def available_listing_extractors():
+    """
+    Lists the listing extractor backends whose library is installed.
+
+    Returns:
+        list: The names of the usable backends.
+    """
+    modules = {'bs4': 'bs4', 'lxml': 'lxml.html', 'selectolax': 'selectolax.lexbor'}
+    available = []
+    for name, module in modules.items():
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def get_listing_extractor(name=None):
+    """
+    Returns the listing extractor for the given backend name.
+
+    Args:
+        name (str, optional): One of ``bs4``, ``lxml`` or ``selectolax``. Defaults to
+            ``lxml`` when installed, falling back to ``bs4``.
+
+    Returns:
+        callable: A function taking ``(content, base_url)``.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if name is None:
+        # Checked without importing, so lxml is only loaded when the first page is parsed
+        name = 'lxml' if importlib.util.find_spec('lxml') is not None else 'bs4'
+    if name not in LISTING_EXTRACTORS:
+        raise ValueError(f"Unknown listing extractor '{name}', expected one of {sorted(LISTING_EXTRACTORS)}")
+    return LISTING_EXTRACTORS[name]
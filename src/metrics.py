@@ -0,0 +1,268 @@
+import time
+import json
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+# Crawl pipeline stages timed by the scrapers
+LISTING_FETCH = 'listing_fetch'
+LISTING_PARSE = 'listing_parse'
+SITEMAP_FETCH = 'sitemap_fetch'
+PRODUCT_FETCH = 'product_fetch'
+PRODUCT_PARSE = 'product_parse'
+PRODUCT_EXTRACT = 'product_extract'
+WRITE = 'write'
+STAGES = (LISTING_FETCH, LISTING_PARSE, SITEMAP_FETCH, PRODUCT_FETCH, PRODUCT_PARSE, PRODUCT_EXTRACT, WRITE)
+
+# Default interval in seconds between periodic summaries
+DEFAULT_REPORT_INTERVAL = 60
+
+
+class StageTimer:
+    """
+    Accumulated timings of one pipeline stage.
+    """
+    __slots__ = ('count', 'total', 'max', 'errors')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'max_seconds': self.max,
+        }
+
+
+class Metrics:
+    """
+    Thread-safe timings and counters for every stage of the crawl pipeline.
+
+    Stages are timed with :meth:`timer` and events are counted with
+    :meth:`incr`; worker processes collect their own metrics, which are
+    merged back with :meth:`merge`. The collected values can be logged
+    periodically, dumped as JSON or served in the Prometheus text format.
+
+    A single stage can be profiled with cProfile by setting ``profile_stage``;
+    only code running inside that stage's timer is profiled, so it should be a
+    synchronous stage (``listing_parse``, ``product_parse``, ``product_extract``
+    or ``write``) to keep other tasks of the event loop out of the profile.
+    Product parsing and extraction are only profiled when they run inline
+    (``extract_workers=0``).
+    """
+
+    def __init__(self, profile_stage=None):
+        """
+        Args:
+            profile_stage (str, optional): The stage to profile with cProfile.
+        """
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.started = time.time()
+        self.profiler = None
+        self.profile(profile_stage)
+
+    def profile(self, stage):
+        """
+        Profiles a single stage from now on, or stops profiling when None is given.
+
+        Args:
+            stage (str): The stage to profile.
+        """
+        self.profile_stage = stage
+        if stage is not None and self.profiler is None:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+
+    def observe(self, stage, seconds, error=False):
+        """
+        Records one run of a stage.
+
+        Args:
+            stage (str): The stage name.
+            seconds (float): How long the run took.
+            error (bool, optional): Whether the run failed.
+        """
+        with self.lock:
+            timer = self.stages.get(stage)
+            if timer is None:
+                timer = self.stages[stage] = StageTimer()
+            timer.count += 1
+            timer.total += seconds
+            timer.max = max(timer.max, seconds)
+            if error:
+                timer.errors += 1
+
+    def merge(self, snapshot):
+        """
+        Adds the stages and counters of another :class:`Metrics` snapshot, e.g. from a worker process.
+
+        Args:
+            snapshot (dict): The result of :meth:`snapshot`.
+        """
+        with self.lock:
+            for stage, values in snapshot['stages'].items():
+                timer = self.stages.get(stage)
+                if timer is None:
+                    timer = self.stages[stage] = StageTimer()
+                timer.count += values['count']
+                timer.total += values['total_seconds']
+                timer.max = max(timer.max, values['max_seconds'])
+                timer.errors += values['errors']
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Times the enclosed block as one run of a stage; an exception counts as an error.
+
+        Args:
+            stage (str): The stage name.
+        """
+        profiler = self.profiler if stage == self.profile_stage else None
+        if profiler is not None:
+            profiler.enable()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self.observe(stage, time.perf_counter() - start, error)
+
+    def incr(self, name, value=1):
+        """
+        Increments a counter.
+
+        Args:
+            name (str): The counter name, e.g. ``cache_hits``.
+            value (int, optional): The increment.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        Returns the current values of every stage and counter.
+
+        Returns:
+            dict: ``elapsed_seconds``, ``stages`` (per-stage count, errors, total, mean and
+                max seconds) and ``counters``.
+        """
+        with self.lock:
+            return {
+                'elapsed_seconds': time.time() - self.started,
+                'stages': {stage: timer.as_dict() for stage, timer in self.stages.items()},
+                'counters': dict(self.counters),
+            }
+
+    def summary(self):
+        """
+        Returns a one-line summary of the stage timings and counters.
+        """
+        snapshot = self.snapshot()
+        parts = [f"{stage} {values['count']}x {values['mean_seconds'] * 1000:.1f}ms"
+                 for stage, values in snapshot['stages'].items()]
+        parts.extend(f"{name} {value}" for name, value in snapshot['counters'].items())
+        return f"[{snapshot['elapsed_seconds']:.0f}s] " + ", ".join(parts)
+
+    def log_summary(self):
+        """
+        Logs the summary of the stage timings and counters.
+        """
+        logging.info(f"Metrics: {self.summary()}")
+
+    async def report_periodically(self, interval=DEFAULT_REPORT_INTERVAL):
+        """
+        Logs the summary every ``interval`` seconds until cancelled.
+
+        Args:
+            interval (float, optional): Seconds between summaries.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.log_summary()
+
+    def dump(self, path, profile_path=None):
+        """
+        Writes the metrics as JSON, and the profile of the profiled stage if any.
+
+        Args:
+            path (str): The path of the JSON file.
+            profile_path (str, optional): The path of the cProfile stats file, readable
+                with ``pstats``. Defaults to ``path`` with a ``.prof`` suffix.
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=4)
+        print(f'Metrics saved to {path}')
+        if self.profiler is not None:
+            profile_path = profile_path or path.rsplit('.', 1)[0] + '.prof'
+            self.profiler.dump_stats(profile_path)
+            print(f'Profile of {self.profile_stage} saved to {profile_path}')
+
+    def prometheus(self):
+        """
+        Renders the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE scraper_stage_seconds summary",
+        ]
+        for stage, values in snapshot['stages'].items():
+            lines.append(f'scraper_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+            lines.append(f'scraper_stage_seconds_sum{{stage="{stage}"}} {values["total_seconds"]}')
+        lines.append("# TYPE scraper_stage_errors_total counter")
+        for stage, values in snapshot['stages'].items():
+            lines.append(f'scraper_stage_errors_total{{stage="{stage}"}} {values["errors"]}')
+        lines.append("# TYPE scraper_stage_max_seconds gauge")
+        for stage, values in snapshot['stages'].items():
+            lines.append(f'scraper_stage_max_seconds{{stage="{stage}"}} {values["max_seconds"]}')
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# TYPE scraper_{name}_total counter")
+            lines.append(f"scraper_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9100):
+        """
+        Serves the metrics in the Prometheus text format at ``/metrics``.
+
+        Args:
+            host (str, optional): The interface to listen on.
+            port (int, optional): The port to listen on.
+
+        Returns:
+            aiohttp.web.AppRunner: The running server; call ``cleanup()`` to stop it.
+        """
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.prometheus(), content_type='text/plain')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return runner
+
+
+# The metrics shared by every scraper in this process
+metrics = Metrics()
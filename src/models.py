@@ -0,0 +1,162 @@
+import re
+from dataclasses import dataclass, field, fields
+
+# Values the extractors use for "not available"
+MISSING_VALUES = (None, '', '-')
+PRICE_PATTERN = re.compile(r'^\s*([A-Za-z]{3})?\s*([\d.,]+)?\s*$')
+
+
+def optional_str(value):
+    """
+    Returns a string value, or None for the extractors' "not available" placeholders.
+    """
+    if value in MISSING_VALUES:
+        return None
+    return str(value)
+
+
+def optional_int(value):
+    """
+    Parses an integer value such as a stock level, or None if it is missing or not numeric.
+    """
+    if value in MISSING_VALUES:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def optional_url(value):
+    """
+    Returns an image URL, or None if the extractor prefixed a missing path with ``https:``.
+    """
+    if value in MISSING_VALUES or value.removeprefix('https:') in MISSING_VALUES:
+        return None
+    return value
+
+
+def parse_price(value):
+    """
+    Splits a formatted price such as ``"IDR 1,250,000"`` into currency and amount.
+
+    Args:
+        value (str): The formatted price.
+
+    Returns:
+        tuple: The currency code (or None) and the amount as a float (or None).
+    """
+    match = PRICE_PATTERN.match(value or '')
+    if not match:
+        return None, None
+    currency, amount = match.groups()
+    try:
+        amount = float(amount.replace(',', '')) if amount else None
+    except ValueError:
+        amount = None
+    return currency and currency.upper(), amount
+
+
+def split_values(value):
+    """
+    Normalizes a list of option values given either as a list or a comma-separated string.
+    """
+    if isinstance(value, str):
+        value = value.split(', ')
+    return [item for item in value or [] if item not in MISSING_VALUES]
+
+
+@dataclass(slots=True)
+class Sku:
+    """
+    A single purchasable variant of a product.
+    """
+    id: str
+    product_id: str
+    status: str = None
+    color: str = None
+    size: str = None
+    stock: int = None
+    image_url: str = None
+
+    @classmethod
+    def from_record(cls, record, product_id):
+        """
+        Builds a SKU from an entry of an extracted product's ``Skus`` list.
+
+        Args:
+            record (dict): The extracted SKU.
+            product_id (str): The ID of the product the SKU belongs to.
+
+        Returns:
+            Sku: The typed SKU.
+        """
+        return cls(
+            id=optional_str(record.get("ID")),
+            product_id=product_id,
+            status=optional_str(record.get("Status")),
+            color=optional_str(record.get("Color")),
+            size=optional_str(record.get("Size")),
+            stock=optional_int(record.get("Stock", record.get("Stock Level"))),
+            image_url=optional_url(record.get("Image URL")),
+        )
+
+
+@dataclass(slots=True)
+class Product:
+    """
+    A product with numeric price and typed SKUs.
+
+    Both shapes produced by ``extract_product_data`` ("URL"/"Url", "Sizes"/"Size",
+    "Stock"/"Stock Level", prices formatted as strings) map onto this one model.
+    """
+    id: str
+    url: str
+    name: str = None
+    brand: str = None
+    category: str = None
+    description: str = None
+    currency: str = None
+    price: float = None
+    sizes: list = field(default_factory=list)
+    colors: list = field(default_factory=list)
+    images: list = field(default_factory=list)
+    skus: list = field(default_factory=list)
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Builds a product from a dictionary produced by ``extract_product_data``.
+
+        Args:
+            record (dict): The extracted product.
+
+        Returns:
+            Product: The typed product.
+        """
+        product_id = optional_str(record.get("ID"))
+        currency, price = parse_price(record.get("Price"))
+        images = []
+        for image in record.get("Images") or []:
+            if isinstance(image, dict):
+                images.extend(image.get("Image URL", []))
+            else:
+                images.append(image)
+        return cls(
+            id=product_id,
+            url=record.get("URL", record.get("Url")),
+            name=optional_str(record.get("Name")),
+            brand=optional_str(record.get("Brand")),
+            category=optional_str(record.get("Category")),
+            description=optional_str(record.get("Description")),
+            currency=currency,
+            price=price,
+            sizes=split_values(record.get("Sizes", record.get("Size"))),
+            colors=split_values(record.get("Colors", record.get("Color"))),
+            images=[url for url in map(optional_url, images) if url],
+            skus=[Sku.from_record(sku, product_id) for sku in record.get("Skus") or []],
+        )
+
+
+PRODUCT_COLUMNS = [f.name for f in fields(Product) if f.name != 'skus']
+SKU_COLUMNS = [f.name for f in fields(Sku)]
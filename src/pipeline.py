@@ -0,0 +1,258 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from src.json_extract import extract_json_payload
+from src.item_extract import extract_product_data
+from src.metrics import metrics as default_metrics, Metrics, PRODUCT_PARSE, PRODUCT_EXTRACT
+from src.utils import setup_logging
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Modules imported once by the fork server that worker processes are forked from; preloading
+# __main__ keeps every worker from importing the entry script again
+WORKER_PRELOAD = ['__main__', 'src.pipeline']
+
+
+def extract_page(body, cleaned_url, metrics=None):
+    """
+    Extracts product data from the raw HTML of a product page.
+
+    Module-level so it can run in a worker process.
+
+    Args:
+        body (bytes): The raw HTML of the product page.
+        cleaned_url (str): The product URL without query parameters.
+        metrics (Metrics, optional): Where the parse and extract timings are recorded.
+            Defaults to the process-wide metrics.
+
+    Returns:
+        list: The extracted product data, or None if the page has no usable product data.
+    """
+    metrics = metrics if metrics is not None else default_metrics
+    with metrics.timer(PRODUCT_PARSE):
+        try:
+            data = extract_json_payload(body)
+        except ValueError as e:
+            data = e
+    if isinstance(data, ValueError):
+        metrics.incr('invalid_product_data')
+        logging.error(f"Invalid product data at {cleaned_url}: {data}")
+        return None
+    if data is None:
+        metrics.incr('product_data_not_found')
+        logging.warning("Product data not found.")
+        return None
+    with metrics.timer(PRODUCT_EXTRACT):
+        return extract_product_data(data, cleaned_url)
+
+
+def worker_context():
+    """
+    Returns the multiprocessing context worker processes are started with.
+
+    Workers are forked from a fork server that has only imported the extraction
+    code, not from the crawler, so they never inherit its event loop, sockets,
+    threads, open SQLite connections or memory. Platforms without a fork server
+    (Windows) spawn a fresh interpreter per worker instead.
+
+    Returns:
+        multiprocessing.context.BaseContext: The ``forkserver`` or ``spawn`` context.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(WORKER_PRELOAD)
+    return context
+
+
+def worker_options():
+    """
+    Returns the ``initializer`` and ``initargs`` arguments of a worker process pool.
+
+    Workers log at the crawler's level to the folder of its log file, if it logs to one.
+    """
+    root = logging.getLogger()
+    log_dir = next((os.path.dirname(handler.baseFilename) for handler in root.handlers
+                    if isinstance(handler, logging.FileHandler)), None)
+    return {'initializer': initialize_worker, 'initargs': (root.level, log_dir)}
+
+
+def initialize_worker(log_level, log_dir):
+    """
+    Sets up a freshly started worker process.
+
+    Args:
+        log_level (int): The logging level.
+        log_dir (str): The folder of the log file, or None to leave logging unconfigured.
+    """
+    if log_dir is not None:
+        setup_logging(log_level, log_dir=log_dir)
+
+
+def extract_page_in_worker(body, cleaned_url):
+    """
+    Runs :func:`extract_page` in a worker process.
+
+    Returns:
+        tuple: The extracted product data, a snapshot of the worker's timings, which
+            the parent merges into its own metrics, and the worker's resource usage
+            (see :meth:`ExtractionStage.worker_usage`), or None where unknown.
+    """
+    metrics = Metrics()
+    result = extract_page(body, cleaned_url, metrics)
+    usage = None
+    if resource is not None:
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+        usage = (os.getpid(), rusage.ru_utime + rusage.ru_stime, rusage.ru_maxrss)
+    return result, metrics.snapshot(), usage
+
+
+class ExtractionStage:
+    """
+    A pool of parse/extract worker processes fed from a bounded queue.
+
+    Fetchers hand raw HTML to :meth:`extract` and await the result. Pages wait in
+    a bounded queue until a consumer passes them to a ``ProcessPoolExecutor``, so
+    one event loop can keep the network saturated while every core parses; once
+    the queue is full, fetchers block instead of piling up response bodies.
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        """
+        Args:
+            workers (int, optional): Number of worker processes. Defaults to the CPU count.
+            queue_size (int, optional): Maximum number of pages waiting for a worker.
+                Defaults to four per worker.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.workers * 4
+        self.executor = None
+        self.queue = None
+        self.consumers = []
+        # Latest CPU time and peak RSS reported by every worker process, by process ID
+        self.usage = {}
+
+    async def start(self):
+        """
+        Starts the worker processes and the queue consumers if they are not running.
+        """
+        if self.executor is not None:
+            return
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=worker_context(), **worker_options())
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            body, cleaned_url, future = await self.queue.get()
+            try:
+                result, snapshot, usage = await loop.run_in_executor(
+                    self.executor, extract_page_in_worker, body, cleaned_url
+                )
+                default_metrics.merge(snapshot)
+                if usage is not None:
+                    self.usage[usage[0]] = usage[1:]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+    async def extract(self, body, cleaned_url):
+        """
+        Queues a product page for extraction and waits for the result.
+
+        Args:
+            body (bytes): The raw HTML of the product page.
+            cleaned_url (str): The product URL without query parameters.
+
+        Returns:
+            list: The extracted product data, or None if the page has no usable product data.
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((body, cleaned_url, future))
+        return await future
+
+    def worker_usage(self):
+        """
+        Returns the resources used by the worker processes so far.
+
+        Workers are not children of this process, so ``RUSAGE_CHILDREN`` does not count them.
+
+        Returns:
+            dict: ``cpu_seconds``, the total CPU time of the workers, and ``peak_rss``, the
+                highest peak RSS of a worker (in kilobytes on Linux).
+        """
+        return {
+            'cpu_seconds': sum(cpu_seconds for cpu_seconds, _ in self.usage.values()),
+            'peak_rss': max((peak_rss for _, peak_rss in self.usage.values()), default=0),
+        }
+
+    async def close(self):
+        """
+        Stops the queue consumers and shuts the worker processes down.
+        """
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        self.consumers = []
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.queue = None
+
+
+async def bounded_map(func, items, window):
+    """
+    Applies a coroutine function to the items of an async iterable concurrently,
+    yielding the results as the calls complete.
+
+    At most ``window`` calls run at once and the next item is only requested while
+    there is room, so a slow consumer holds the producer back and memory is bounded
+    by the window rather than by the number of items.
+
+    Args:
+        func (callable): The coroutine function applied to every item.
+        items (async iterable): The items.
+        window (int): Maximum number of calls in flight.
+
+    Yields:
+        The result of every call, in completion order.
+    """
+    iterator = items.__aiter__()
+    running = set()
+    next_item = None
+    try:
+        while True:
+            if next_item is None and iterator is not None and len(running) < window:
+                next_item = asyncio.ensure_future(iterator.__anext__())
+            waiting = running | {next_item} if next_item is not None else running
+            if not waiting:
+                return
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if next_item in done:
+                done.discard(next_item)
+                try:
+                    running.add(asyncio.ensure_future(func(next_item.result())))
+                except StopAsyncIteration:
+                    iterator = None
+                next_item = None
+            for task in done:
+                running.discard(task)
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+        if next_item is not None:
+            next_item.cancel()
@@ -0,0 +1,321 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Default sustained request rate per host, in requests per second
+DEFAULT_RATE = 10
+# Default number of requests a host may receive in a burst
+DEFAULT_BURST = 10
+# Default maximum number of in-flight requests per host
+DEFAULT_MAX_CONCURRENCY = 8
+# Default number of retries after the first attempt
+DEFAULT_MAX_RETRIES = 5
+# Default timeout in seconds of a blocking request
+DEFAULT_TIMEOUT = 30
+# Base and cap of the exponential backoff, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60
+# Statuses that are retried; 429 and 503 also count as throttling
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+Response = namedtuple('Response', ['url', 'status', 'headers', 'body'])
+
+
+def parse_retry_after(value):
+    """
+    Parses a ``Retry-After`` header given either in seconds or as an HTTP date.
+
+    Args:
+        value (str): The header value.
+
+    Returns:
+        float: The number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    """
+    The politeness state of a single host: token bucket, pause and adaptive concurrency limit.
+
+    The token bucket hands out reservations under a thread lock, so the same
+    state can pace both the async and the blocking request paths.
+    """
+
+    def __init__(self, rate, burst, max_concurrency, min_concurrency):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.successes = 0
+        self.lock = threading.Lock()
+        self.condition = None
+        self.loop = None
+
+    def reserve(self):
+        """
+        Reserves the next request slot.
+
+        Returns:
+            float: The number of seconds to wait before sending the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            if self.rate:
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                self.tokens -= 1
+                if self.tokens < 0:
+                    delay = max(delay, -self.tokens / self.rate)
+            return delay
+
+    def pause(self, seconds):
+        """
+        Holds back every request to this host for the given number of seconds.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def on_throttled(self):
+        """
+        Halves the concurrency limit after a throttling response.
+        """
+        with self.lock:
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self.successes = 0
+
+    def on_success(self):
+        """
+        Grows the concurrency limit by one after a full window of successful requests.
+        """
+        with self.lock:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self.successes = 0
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        if self.condition is None or self.loop is not loop:
+            self.condition = asyncio.Condition()
+            self.loop = loop
+            self.in_flight = 0
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+class RequestScheduler:
+    """
+    A per-host politeness scheduler shared by every scraper.
+
+    Each request waits for a token from its host's token bucket, honors any
+    ``Retry-After`` pause, and is retried with jittered exponential backoff on
+    connection errors and 429/5xx responses. Throttling (429/503) halves the
+    host's concurrency limit, which grows back by one after each window of
+    successful requests.
+
+    The ``requests``, ``retries`` and ``throttled`` counters are updated under a
+    lock, since blocking requests are sent from several sitemap threads at once.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency=1, max_retries=DEFAULT_MAX_RETRIES, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            rate (float, optional): Sustained requests per second per host; None disables pacing.
+            burst (int, optional): Number of requests a host may receive in a burst.
+            max_concurrency (int, optional): Maximum in-flight async requests per host.
+            min_concurrency (int, optional): Floor of the adaptive concurrency limit.
+            max_retries (int, optional): Number of retries after the first attempt.
+            timeout (float, optional): Timeout in seconds of a blocking request.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.hosts = {}
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._sync_session = None
+
+    def host(self, url):
+        """
+        Returns the politeness state of a URL's host.
+
+        Args:
+            url (str): The request URL.
+
+        Returns:
+            HostState: The state shared by every request to that host.
+        """
+        netloc = urlparse(url).netloc
+        with self._lock:
+            if netloc not in self.hosts:
+                self.hosts[netloc] = HostState(self.rate, self.burst, self.max_concurrency, self.min_concurrency)
+            return self.hosts[netloc]
+
+    def count(self, counter):
+        """
+        Increments one of the ``requests``, ``retries`` and ``throttled`` counters.
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Computes the delay before a retry.
+
+        Args:
+            attempt (int): The zero-based number of the failed attempt.
+            retry_after (float, optional): The server's ``Retry-After`` delay in seconds.
+
+        Returns:
+            float: A fully jittered exponential delay, no shorter than ``retry_after``.
+        """
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def _on_response(self, host, url, status, headers, attempt):
+        """
+        Updates the host state after a response and decides whether to retry.
+
+        Returns:
+            float: The delay before retrying, or None if the response is final.
+        """
+        if status not in RETRY_STATUSES:
+            host.on_success()
+            return None
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if status in THROTTLE_STATUSES:
+            self.count('throttled')
+            host.on_throttled()
+            if retry_after is not None:
+                host.pause(retry_after)
+        if attempt >= self.max_retries:
+            return None
+        delay = self.backoff(attempt, retry_after)
+        logging.warning(f"Got {status} from {url}, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+        return delay
+
+    async def fetch(self, session, url, headers=None):
+        """
+        Sends a GET request through the given aiohttp session.
+
+        Args:
+            session (aiohttp.ClientSession): The session used for the request.
+            url (str): The request URL.
+            headers (dict, optional): Extra request headers.
+
+        Returns:
+            Response: The final response; statuses below 400 (including 304) are returned as-is.
+
+        Raises:
+            aiohttp.ClientError: On a non-retryable error status, or once retries are exhausted.
+            asyncio.TimeoutError: If the last attempt timed out.
+        """
+        import aiohttp
+
+        host = self.host(url)
+        attempt = 0
+        while True:
+            await host.acquire()
+            try:
+                await asyncio.sleep(host.reserve())
+                self.count('requests')
+                async with session.get(url, headers=headers) as response:
+                    body = await response.read()
+                    delay = self._on_response(host, url, response.status, response.headers, attempt)
+                    if delay is None:
+                        response.raise_for_status()
+                        return Response(str(response.url), response.status, response.headers, body)
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"Error accessing {url}: {e!r}, retrying in {delay:.1f}s")
+            finally:
+                await host.release()
+            self.count('retries')
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def fetch_sync(self, url, headers=None, stream=False):
+        """
+        Sends a blocking GET request with ``requests``.
+
+        Args:
+            url (str): The request URL.
+            headers (dict, optional): The request headers.
+            stream (bool, optional): Whether to return the body as a file-like stream,
+                with any ``Content-Encoding`` already decoded, instead of bytes. The caller
+                must close it.
+
+        Returns:
+            Response: The final response; statuses below 400 are returned as-is.
+
+        Raises:
+            requests.RequestException: On a non-retryable error status, or once retries are exhausted.
+        """
+        import requests
+
+        if self._sync_session is None:
+            self._sync_session = requests.Session()
+        host = self.host(url)
+        attempt = 0
+        while True:
+            time.sleep(host.reserve())
+            self.count('requests')
+            try:
+                response = self._sync_session.get(url, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"Error accessing {url}: {e!r}, retrying in {delay:.1f}s")
+            else:
+                delay = self._on_response(host, url, response.status_code, response.headers, attempt)
+                if delay is None:
+                    if response.status_code >= 400:
+                        response.close()
+                    response.raise_for_status()
+                    if stream:
+                        response.raw.decode_content = True
+                        # Keep the stream readable at EOF for buffered and gzip readers
+                        response.raw.auto_close = False
+                        return Response(response.url, response.status_code, response.headers, response.raw)
+                    return Response(response.url, response.status_code, response.headers, response.content)
+                response.close()
+            self.count('retries')
+            attempt += 1
+            time.sleep(delay)
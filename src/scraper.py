@@ -1,17 +1,67 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import asyncio
+import logging
+from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
+from src.listing_extract import get_listing_extractor
+from src.scheduler import RequestScheduler
+from src.metrics import metrics, LISTING_FETCH, LISTING_PARSE
+from src.archive import LISTING
+
+# Maximum number of listing pages fetched ahead once the page count is known
+DEFAULT_PREFETCH = 4
 
 class NeimanMarcusScraper:
     """
     A class for scraping product URLs from the Neiman Marcus website.
     """
 
-    def __init__(self):
+    def __init__(self, parser=None, scheduler=None, archive=None):
+        """
+        Args:
+            parser (str, optional): The listing extractor backend (``bs4``, ``lxml`` or
+                ``selectolax``). Defaults to ``lxml`` when installed.
+            scheduler (RequestScheduler, optional): The scheduler pacing and retrying requests.
+            archive (ResponseArchive, optional): Where fetched listing pages are archived raw.
+        """
         self.base_url = "https://www.neimanmarcus.com"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.extract_listing = get_listing_extractor(parser)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.archive = archive
+
+    def parse_listing(self, content):
+        """
+        Parses a listing page into its product URLs, next page URL and page count.
+
+        Args:
+            content (bytes): The raw HTML of the listing page.
+
+        Returns:
+            tuple: A tuple containing three elements:
+                - A list of product URLs found on the page.
+                - The URL for the next page, or None if there is no next page.
+                - The highest page number linked from the pagination, or None if unknown.
+        """
+        with metrics.timer(LISTING_PARSE):
+            return self.extract_listing(content, self.base_url)
+
+    @staticmethod
+    def page_url(url, page):
+        """
+        Builds the URL of a given listing page from a category URL.
+
+        Args:
+            url (str): The category URL.
+            page (int): The page number.
+
+        Returns:
+            str: The category URL with its ``page`` query parameter set.
+        """
+        parts = urlparse(url)
+        query = parse_qs(parts.query)
+        query['page'] = [str(page)]
+        return urlunparse(parts._replace(query=urlencode(query, doseq=True)))
 
     def get_product_urls(self, url):
         """
@@ -25,17 +75,11 @@ class NeimanMarcusScraper:
                 - A list of product URLs scraped from the given URL.
                 - The URL for the next page, or None if there is no next page.
         """
-        response = requests.get(url, headers=self.headers)
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        product_url_elements = soup.find_all('div', class_='product-thumbnail')
-        product_urls = [urljoin(self.base_url, link['href'])
-                        for product_element in product_url_elements
-                        if (link := product_element.find('a', class_='product-thumbnail__link')) and 'href' in link.attrs]
-
-        next_page_element = soup.find('a', class_='arrow-button--right')
-        next_page_url = urljoin(self.base_url, next_page_element['href']) if next_page_element else None
-
+        with metrics.timer(LISTING_FETCH):
+            response = self.scheduler.fetch_sync(url, headers=self.headers)
+        if self.archive is not None:
+            self.archive.put(url, response.body, LISTING)
+        product_urls, next_page_url, _ = self.parse_listing(response.body)
         return product_urls, next_page_url
 
     def scrape_all_product_urls(self, start_url):
@@ -56,4 +100,95 @@ class NeimanMarcusScraper:
             product_urls, current_url = self.get_product_urls(current_url)
             all_product_urls.extend(product_urls)
 
-        return all_product_urls
\ No newline at end of file
+        return all_product_urls
+
+    async def fetch_listing_page(self, session, url):
+        """
+        Asynchronously fetches and parses a single listing page.
+
+        Args:
+            session (aiohttp.ClientSession): The session used for the request.
+            url (str): The URL of the listing page.
+
+        Returns:
+            tuple: The result of :meth:`parse_listing`.
+
+        Raises:
+            aiohttp.ClientError: If the page could not be fetched.
+            asyncio.TimeoutError: If the request timed out.
+        """
+        logging.debug(f"Scraping: {url}")
+        with metrics.timer(LISTING_FETCH):
+            response = await self.scheduler.fetch(session, url, headers=self.headers)
+        if self.archive is not None:
+            await self.archive.aput(url, response.body, LISTING)
+        return self.parse_listing(response.body)
+
+    async def iter_listing_pages(self, session, start_url, prefetch=DEFAULT_PREFETCH, skip=()):
+        """
+        Asynchronously yields each listing page's product URLs as soon as it is parsed.
+
+        When the first page links to the last page number, the remaining pages are
+        fetched ahead concurrently (at most ``prefetch`` at a time); otherwise the
+        ``next`` links are followed one page at a time.
+
+        Args:
+            session (aiohttp.ClientSession): The session used for the requests.
+            start_url (str): The starting URL to begin scraping.
+            prefetch (int, optional): Maximum number of listing pages fetched concurrently.
+            skip (Container, optional): URLs of pages already parsed by an earlier run. They
+                are not fetched again when the page count is known.
+
+        Yields:
+            tuple: The page URL and its product URLs, or None instead of the product URLs
+                if the page could not be fetched.
+        """
+        import aiohttp
+
+        async def fetch(url):
+            try:
+                return await self.fetch_listing_page(session, url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"Error accessing listing page {url}: {e}")
+                return None, None, None
+
+        product_urls, next_page_url, last_page = await fetch(start_url)
+        yield start_url, product_urls
+
+        if next_page_url and last_page and last_page > 1:
+            semaphore = asyncio.Semaphore(prefetch)
+
+            async def fetch_page(url):
+                async with semaphore:
+                    return url, (await fetch(url))[0]
+
+            page_urls = [self.page_url(start_url, page) for page in range(2, last_page + 1)]
+            tasks = [asyncio.ensure_future(fetch_page(url)) for url in page_urls if url not in skip]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+            return
+
+        while next_page_url:
+            page_url = next_page_url
+            product_urls, next_page_url, _ = await fetch(page_url)
+            yield page_url, product_urls
+
+    async def iter_product_urls(self, session, start_url, prefetch=DEFAULT_PREFETCH):
+        """
+        Asynchronously yields product URLs as each listing page is parsed.
+
+        Args:
+            session (aiohttp.ClientSession): The session used for the requests.
+            start_url (str): The starting URL to begin scraping.
+            prefetch (int, optional): Maximum number of listing pages fetched concurrently.
+
+        Yields:
+            str: Product URLs in the order their pages finish parsing.
+        """
+        async for _, product_urls in self.iter_listing_pages(session, start_url, prefetch):
+            for product_url in product_urls or []:
+                yield product_url
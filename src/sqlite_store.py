@@ -0,0 +1,56 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# Seconds a connection waits for another process to release the database lock
+DEFAULT_BUSY_TIMEOUT = 60
+
+
+class SQLiteStore:
+    """
+    The base of the persistent stores kept in a SQLite file.
+
+    The connection runs in autocommit mode with a write-ahead log, so readers
+    never block the writer and several processes can share one file; statements
+    that must apply together are grouped with ``transaction``. Every store opens
+    its file the same way, so their locking behaviour cannot drift apart.
+    """
+
+    def __init__(self, path, schema, busy_timeout=DEFAULT_BUSY_TIMEOUT, **options):
+        """
+        Args:
+            path (str): The path of the SQLite database file.
+            schema (str): The SQL script creating the tables, run every time the file is opened.
+            busy_timeout (float, optional): Seconds to wait for another process to release the database lock.
+            **options: Options passed to ``sqlite3.connect``, e.g. ``check_same_thread``.
+        """
+        folder_path = os.path.dirname(path)
+        if folder_path and not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None, timeout=busy_timeout, **options)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(schema)
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Groups several statements into one transaction.
+
+        Args:
+            immediate (bool, optional): Whether to take the write lock up front, so
+                a read followed by a write cannot race another process.
+        """
+        self.connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield self.connection
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def close(self):
+        """
+        Closes the underlying database connection.
+        """
+        self.connection.close()
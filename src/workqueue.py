@@ -0,0 +1,503 @@
+import json
+import time
+import threading
+from collections import namedtuple
+from src.canonical import product_key
+from src.sqlite_store import SQLiteStore
+
+# Seconds a leased task stays invisible to other workers before it is handed out again
+DEFAULT_VISIBILITY_TIMEOUT = 300
+# Number of leases after which a failing task is moved to the dead letters
+DEFAULT_MAX_ATTEMPTS = 3
+
+LISTING = 'listing'
+PRODUCT = 'product'
+
+Lease = namedtuple('Lease', ['id', 'task', 'attempts'])
+
+
+def listing_task(url, category=None, expand=True):
+    """
+    Builds the task of a listing page.
+
+    Args:
+        url (str): The listing page URL.
+        category (str, optional): The category URL. Defaults to ``url``.
+        expand (bool, optional): Whether the worker queues the category's other listing
+            pages after parsing this one: every page up to the last one linked from the
+            pagination, or else the next page, which is expanded in turn.
+
+    Returns:
+        dict: The task.
+    """
+    return {'kind': LISTING, 'url': url, 'category': category or url, 'lastmod': None, 'expand': expand}
+
+
+def product_task(url, category, lastmod=None):
+    """
+    Builds the task of a product page.
+
+    Args:
+        url (str): The product page URL.
+        category (str): The category URL the product was found in.
+        lastmod (str, optional): The product's sitemap ``lastmod`` value.
+
+    Returns:
+        dict: The task. ``categories`` lists the categories whose output the product is
+            written to; the queue adds those the product is found in later.
+    """
+    return {'kind': PRODUCT, 'url': url, 'category': category, 'categories': [category], 'lastmod': lastmod,
+            'expand': False}
+
+
+def task_id(task):
+    """
+    Returns the identity of a task; a task is only queued once per queue.
+
+    Products are identified by :func:`~src.canonical.product_key` alone, so a product
+    listed in several categories, or under several URL variants, is fetched once.
+    """
+    if task['kind'] == PRODUCT:
+        return f"{PRODUCT}:{product_key(task['url'])}"
+    return f"{task['kind']}:{task['category']}:{task['url']}"
+
+
+def merge_tasks(tasks):
+    """
+    Merges the tasks of a batch by identity, collecting the categories of a product found more than once.
+
+    Returns:
+        dict: The tasks by ID, in their original order.
+    """
+    merged = {}
+    for task in tasks:
+        id = task_id(task)
+        if id not in merged:
+            merged[id] = task
+        elif task['kind'] == PRODUCT:
+            merged[id]['categories'].extend(
+                category for category in task['categories'] if category not in merged[id]['categories'])
+    return merged
+
+
+def unwritten_categories(stored, lease):
+    """
+    Returns the categories a product task gained while it was leased, which the lease did not write to.
+
+    Args:
+        stored (dict): The task as currently stored in the queue.
+        lease (Lease): The lease being acknowledged.
+
+    Returns:
+        list: The categories left to write the product to.
+    """
+    if lease.task['kind'] != PRODUCT:
+        return []
+    return [category for category in stored['categories'] if category not in lease.task['categories']]
+
+
+class SQLiteWorkQueue(SQLiteStore):
+    """
+    A work queue stored in a SQLite file, shared by worker processes on one machine.
+
+    Tasks are leased rather than removed: a leased task becomes invisible for
+    ``visibility_timeout`` seconds and is handed out again if the worker neither
+    acknowledges nor releases it in time, e.g. because it crashed. Leasing runs
+    in an immediate transaction, so SQLite's file lock keeps two workers from
+    taking the same task. A task is only ever queued once, even after it is done;
+    a product found in a new category is queued again for that category only.
+
+    Every method can be called from any thread, one at a time, so a worker can
+    run them off its event loop with ``asyncio.to_thread``.
+    """
+
+    def __init__(self, path="./state/workqueue.db", visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            path (str, optional): The path of the SQLite database file.
+            visibility_timeout (float, optional): Seconds a lease lasts.
+            max_attempts (int, optional): Number of leases after which a failing task is given up.
+        """
+        super().__init__(
+            path,
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "  id TEXT PRIMARY KEY, task TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pending',"
+            "  attempts INTEGER NOT NULL DEFAULT 0, visible_at REAL NOT NULL, error TEXT);"
+            "CREATE INDEX IF NOT EXISTS tasks_visible ON tasks (status, visible_at);"
+            "CREATE TABLE IF NOT EXISTS memberships ("
+            "  id TEXT NOT NULL, category TEXT NOT NULL, PRIMARY KEY (id, category));",
+            check_same_thread=False,
+        )
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+
+    def put(self, tasks):
+        """
+        Queues tasks that were never queued before.
+
+        A product already queued from another category gains the new category instead;
+        if it is already done, it is queued again to be written to that category only.
+
+        Args:
+            tasks (iterable): The tasks.
+
+        Returns:
+            int: The number of tasks actually queued.
+        """
+        now = time.time()
+        queued = 0
+        with self.lock, self.transaction(immediate=True) as connection:
+            for id, task in merge_tasks(tasks).items():
+                new_categories = []
+                for category in task.get('categories', ()):
+                    if connection.execute(
+                        "INSERT OR IGNORE INTO memberships (id, category) VALUES (?, ?)", (id, category)
+                    ).rowcount:
+                        new_categories.append(category)
+                if connection.execute(
+                    "INSERT OR IGNORE INTO tasks (id, task, visible_at) VALUES (?, ?, ?)", (id, json.dumps(task), now)
+                ).rowcount:
+                    queued += 1
+                elif new_categories:
+                    stored, status = connection.execute(
+                        "SELECT task, status FROM tasks WHERE id = ?", (id,)
+                    ).fetchone()
+                    stored = json.loads(stored)
+                    if status == 'pending':
+                        stored['categories'].extend(new_categories)
+                        connection.execute("UPDATE tasks SET task = ? WHERE id = ?", (json.dumps(stored), id))
+                    elif status == 'done':
+                        stored['categories'] = new_categories
+                        connection.execute(
+                            "UPDATE tasks SET task = ?, status = 'pending', attempts = 0, visible_at = ? WHERE id = ?",
+                            (json.dumps(stored), now, id),
+                        )
+                        queued += 1
+        return queued
+
+    def lease(self, count=1):
+        """
+        Leases up to ``count`` visible tasks, oldest first.
+
+        Args:
+            count (int, optional): The maximum number of tasks to lease.
+
+        Returns:
+            list: The leases; empty if no task is visible right now.
+        """
+        now = time.time()
+        with self.lock, self.transaction(immediate=True) as connection:
+            rows = connection.execute(
+                "SELECT id, task, attempts FROM tasks WHERE status = 'pending' AND visible_at <= ? "
+                "ORDER BY visible_at LIMIT ?",
+                (now, count),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE tasks SET attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                [(now + self.visibility_timeout, row[0]) for row in rows],
+            )
+        return [Lease(id, json.loads(task), attempts + 1) for id, task, attempts in rows]
+
+    def ack(self, lease):
+        """
+        Marks a leased task as done, or queues it again for the categories it gained while leased.
+        """
+        with self.lock, self.transaction(immediate=True) as connection:
+            row = connection.execute("SELECT task FROM tasks WHERE id = ?", (lease.id,)).fetchone()
+            stored = json.loads(row[0]) if row is not None else None
+            remaining = unwritten_categories(stored, lease) if stored is not None else []
+            if remaining:
+                stored['categories'] = remaining
+                connection.execute(
+                    "UPDATE tasks SET task = ?, attempts = 0, visible_at = ?, error = NULL WHERE id = ?",
+                    (json.dumps(stored), time.time(), lease.id),
+                )
+            else:
+                connection.execute("UPDATE tasks SET status = 'done', error = NULL WHERE id = ?", (lease.id,))
+
+    def nack(self, lease, error=None, delay=0):
+        """
+        Releases a failed lease, moving the task to the dead letters once it reached the maximum attempts.
+
+        Args:
+            lease (Lease): The lease.
+            error (Exception or str, optional): The failure.
+            delay (float, optional): Seconds before the task becomes visible again.
+        """
+        status = 'dead' if lease.attempts >= self.max_attempts else 'pending'
+        with self.lock:
+            self.connection.execute(
+                "UPDATE tasks SET status = ?, visible_at = ?, error = ? WHERE id = ?",
+                (status, time.time() + delay, None if error is None else str(error), lease.id),
+            )
+
+    def stats(self):
+        """
+        Counts the tasks by state.
+
+        Returns:
+            dict: The number of ``ready``, ``leased``, ``done`` and ``dead`` tasks.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT "
+                "  SUM(status = 'pending' AND visible_at <= ?), SUM(status = 'pending' AND visible_at > ?),"
+                "  SUM(status = 'done'), SUM(status = 'dead') "
+                "FROM tasks",
+                (now, now),
+            ).fetchone()
+        return dict(zip(('ready', 'leased', 'done', 'dead'), (value or 0 for value in row)))
+
+    def dead_letters(self):
+        """
+        Returns the tasks that were given up, with their last error.
+
+        Returns:
+            list: ``(task, error)`` pairs.
+        """
+        with self.lock:
+            return [(json.loads(task), error) for task, error in self.connection.execute(
+                "SELECT task, error FROM tasks WHERE status = 'dead'"
+            )]
+
+    def close(self):
+        """
+        Closes the underlying database connection.
+        """
+        with self.lock:
+            super().close()
+
+
+class RedisWorkQueue:
+    """
+    A work queue stored in Redis, shared by workers on any number of machines.
+
+    Offers the same leases, acknowledgements and visibility timeouts as
+    :class:`SQLiteWorkQueue`. Every queued task sits in a sorted set scored by
+    the time it becomes visible; leasing moves the score past the visibility
+    timeout inside a ``WATCH``/``MULTI`` transaction, and queueing and
+    acknowledging tasks are transactions too, so only plain commands are used
+    and any Redis-compatible server (or an in-process stand-in such as
+    fakeredis) works. Requires the ``redis`` package.
+    """
+
+    def __init__(self, client=None, url="redis://localhost:6379/0", name="neiman",
+                 visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            client (redis.Redis, optional): The Redis client. Created from ``url`` if not given.
+            url (str, optional): The Redis URL.
+            name (str, optional): The prefix of the queue's keys.
+            visibility_timeout (float, optional): Seconds a lease lasts.
+            max_attempts (int, optional): Number of leases after which a failing task is given up.
+        """
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.queue_key = f"{name}:queue"
+        self.tasks_key = f"{name}:tasks"
+        self.attempts_key = f"{name}:attempts"
+        self.seen_key = f"{name}:seen"
+        self.members_key = f"{name}:members"
+        self.done_key = f"{name}:done"
+        self.dead_key = f"{name}:dead"
+
+    def put(self, tasks):
+        """
+        Queues tasks that were never queued before.
+
+        A product already queued from another category gains the new category instead;
+        if it is already done, it is queued again to be written to that category only.
+
+        Args:
+            tasks (iterable): The tasks.
+
+        Returns:
+            int: The number of tasks actually queued.
+        """
+        from redis.exceptions import WatchError
+
+        tasks = merge_tasks(tasks)
+        if not tasks:
+            return 0
+        ids = list(tasks)
+        members = [(id, category) for id in ids for category in tasks[id].get('categories', ())]
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.seen_key, self.members_key, self.tasks_key, self.dead_key)
+                    seen = dict(zip(ids, pipe.smismember(self.seen_key, ids)))
+                    new_members = {}
+                    if members:
+                        known = pipe.smismember(self.members_key, [f"{id} {category}" for id, category in members])
+                        for (id, category), member in zip(members, known):
+                            if not member:
+                                new_members.setdefault(id, []).append(category)
+                    extended = [id for id in new_members if seen[id]]
+                    stored = dict(zip(extended, pipe.hmget(self.tasks_key, extended))) if extended else {}
+                    dead = dict(zip(extended, pipe.hmget(self.dead_key, extended))) if extended else {}
+
+                    now = time.time()
+                    updates = {id: tasks[id] for id in ids if not seen[id]}
+                    queued = list(updates)
+                    for id in extended:
+                        if stored[id] is not None:
+                            task = json.loads(stored[id])
+                            task['categories'].extend(new_members[id])
+                            updates[id] = task
+                        elif dead[id] is None:
+                            # Done and acknowledged: written again for the new categories only
+                            updates[id] = dict(tasks[id], categories=new_members[id])
+                            queued.append(id)
+
+                    pipe.multi()
+                    pipe.sadd(self.seen_key, *ids)
+                    if new_members:
+                        pipe.sadd(self.members_key, *(f"{id} {category}"
+                                                      for id, categories in new_members.items() for category in categories))
+                    if updates:
+                        pipe.hset(self.tasks_key, mapping={id: json.dumps(task) for id, task in updates.items()})
+                    if queued:
+                        pipe.zadd(self.queue_key, {id: now for id in queued})
+                        pipe.hdel(self.attempts_key, *queued)
+                    pipe.execute()
+                    return len(queued)
+                except WatchError:
+                    continue
+
+    def lease(self, count=1):
+        """
+        Leases up to ``count`` visible tasks, oldest first.
+
+        Args:
+            count (int, optional): The maximum number of tasks to lease.
+
+        Returns:
+            list: The leases; empty if no task is visible right now.
+        """
+        from redis.exceptions import WatchError
+
+        while True:
+            now = time.time()
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.queue_key)
+                    ids = pipe.zrangebyscore(self.queue_key, '-inf', now, start=0, num=count)
+                    if not ids:
+                        return []
+                    pipe.multi()
+                    pipe.zadd(self.queue_key, {id: now + self.visibility_timeout for id in ids})
+                    for id in ids:
+                        pipe.hincrby(self.attempts_key, id, 1)
+                    pipe.hmget(self.tasks_key, ids)
+                    results = pipe.execute()
+                    break
+                except WatchError:
+                    continue
+        attempts = results[1:-1]
+        tasks = results[-1]
+        return [Lease(id.decode(), json.loads(task), attempt)
+                for id, task, attempt in zip(ids, tasks, attempts) if task is not None]
+
+    def ack(self, lease):
+        """
+        Marks a leased task as done, or queues it again for the categories it gained while leased.
+        """
+        from redis.exceptions import WatchError
+
+        while True:
+            with self.client.pipeline() as pipe:
+                try:
+                    pipe.watch(self.tasks_key)
+                    stored = pipe.hget(self.tasks_key, lease.id)
+                    stored = json.loads(stored) if stored is not None else None
+                    remaining = unwritten_categories(stored, lease) if stored is not None else []
+                    pipe.multi()
+                    if remaining:
+                        stored['categories'] = remaining
+                        pipe.hset(self.tasks_key, lease.id, json.dumps(stored))
+                        pipe.zadd(self.queue_key, {lease.id: time.time()})
+                        pipe.hdel(self.attempts_key, lease.id)
+                    else:
+                        pipe.zrem(self.queue_key, lease.id)
+                        pipe.hdel(self.tasks_key, lease.id)
+                        pipe.hdel(self.attempts_key, lease.id)
+                        pipe.incr(self.done_key)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def nack(self, lease, error=None, delay=0):
+        """
+        Releases a failed lease, moving the task to the dead letters once it reached the maximum attempts.
+
+        Args:
+            lease (Lease): The lease.
+            error (Exception or str, optional): The failure.
+            delay (float, optional): Seconds before the task becomes visible again.
+        """
+        pipe = self.client.pipeline()
+        if lease.attempts >= self.max_attempts:
+            pipe.zrem(self.queue_key, lease.id)
+            pipe.hdel(self.tasks_key, lease.id)
+            pipe.hdel(self.attempts_key, lease.id)
+            pipe.hset(self.dead_key, lease.id, json.dumps([lease.task, None if error is None else str(error)]))
+        else:
+            pipe.zadd(self.queue_key, {lease.id: time.time() + delay})
+        pipe.execute()
+
+    def stats(self):
+        """
+        Counts the tasks by state.
+
+        Returns:
+            dict: The number of ``ready``, ``leased``, ``done`` and ``dead`` tasks.
+        """
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcount(self.queue_key, '-inf', now)
+        pipe.zcount(self.queue_key, f'({now}', '+inf')
+        pipe.get(self.done_key)
+        pipe.hlen(self.dead_key)
+        ready, leased, done, dead = pipe.execute()
+        return {'ready': ready, 'leased': leased, 'done': int(done or 0), 'dead': dead}
+
+    def dead_letters(self):
+        """
+        Returns the tasks that were given up, with their last error.
+
+        Returns:
+            list: ``(task, error)`` pairs.
+        """
+        return [tuple(json.loads(value)) for value in self.client.hvals(self.dead_key)]
+
+    def close(self):
+        """
+        Closes the connection to Redis.
+        """
+        self.client.close()
+
+
+def open_queue(url, **options):
+    """
+    Opens a work queue from a URL.
+
+    Args:
+        url (str): ``redis://host:port/db`` for :class:`RedisWorkQueue`, or a SQLite file
+            path (optionally prefixed with ``sqlite:///``) for :class:`SQLiteWorkQueue`.
+        **options: Options passed to the queue, e.g. ``visibility_timeout``.
+
+    Returns:
+        SQLiteWorkQueue or RedisWorkQueue: The queue.
+    """
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(url=url, **options)
+    return SQLiteWorkQueue(url.removeprefix('sqlite:///'), **options)
@@ -0,0 +1,226 @@
+import os
+import gzip
+import json
+import sqlite3
+import hashlib
+
+# Number of appended records between flushes of the output file and its index
+FLUSH_EVERY = 100
+
+
+class JsonLinesWriter:
+    """
+    An append-only JSON Lines writer that deduplicates records by key.
+
+    Each record is written as one line as soon as it is produced. A SQLite index
+    next to the output file maps every record key (the product ``ID`` by default)
+    to a digest of its last written line, so unchanged records are skipped and
+    changed ones are appended without ever re-reading the output file.
+    """
+
+    def __init__(self, filename, folder_path, compress=False, key='ID'):
+        """
+        Args:
+            filename (str): The name of the output file; ``.gz`` is appended when compressing.
+            folder_path (str): The path to the folder where the file will be saved.
+            compress (bool, optional): Whether to write gzip-compressed JSON Lines.
+            key (str, optional): The record field used for deduplication; None appends
+                every record without keeping an index.
+        """
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        if compress and not filename.endswith('.gz'):
+            filename += '.gz'
+        self.file_path = os.path.join(folder_path, filename)
+        self.compress = compress
+        self.key = key
+        self.written = 0
+        self.skipped = 0
+        self._pending = 0
+        self._file = None
+        self._index = None
+        if key is not None:
+            self._index = sqlite3.connect(self.file_path + '.idx')
+            self._index.execute("CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+
+    def _open(self):
+        if self._file is None:
+            if self.compress:
+                self._file = gzip.open(self.file_path, 'ab')
+            else:
+                self._file = open(self.file_path, 'ab')
+        return self._file
+
+    def write(self, record):
+        """
+        Appends a record unless an identical one was already written for its key.
+
+        Args:
+            record (dict): The record to write.
+
+        Returns:
+            bool: True if the record was appended, False if it was a duplicate.
+        """
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        key = record.get(self.key) if self._index is not None else None
+        if key is not None:
+            digest = hashlib.sha1(line).hexdigest()
+            cursor = self._index.execute(
+                "INSERT INTO records (key, digest) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET digest = excluded.digest WHERE digest != excluded.digest",
+                (str(key), digest),
+            )
+            if cursor.rowcount == 0:
+                self.skipped += 1
+                return False
+
+        self._open().write(line)
+        self.written += 1
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self.flush()
+        return True
+
+    def write_many(self, records):
+        """
+        Appends several records.
+
+        Args:
+            records (iterable): The records to write.
+
+        Returns:
+            int: The number of records actually appended.
+        """
+        return sum(self.write(record) for record in records)
+
+    def flush(self):
+        """
+        Flushes the output file, then commits the index so it never runs ahead of the file.
+        """
+        if self._file is not None:
+            self._file.flush()
+        if self._index is not None:
+            self._index.commit()
+        self._pending = 0
+
+    def close(self):
+        """
+        Flushes and closes the output file and its index.
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._index is not None:
+            self._index.close()
+        print(f'Data saved to {self.file_path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_json_lines(file_path):
+    """
+    Lazily reads records from a JSON Lines file, gzip-compressed or not.
+
+    Args:
+        file_path (str): The path of the JSON Lines file.
+
+    Yields:
+        dict: The records in the order they were written.
+    """
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(file_path, 'rb') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def latest_records(records, key='ID'):
+    """
+    Keeps only the last record seen for each key, in first-seen order.
+
+    Args:
+        records (iterable): The records to deduplicate.
+        key (str, optional): The record field used for deduplication.
+
+    Returns:
+        list: The latest record for each key, plus every record without the key.
+    """
+    latest = {}
+    for position, record in enumerate(records):
+        record_key = record.get(key)
+        latest[record_key if record_key is not None else ('', position)] = record
+    return list(latest.values())
+
+
+def compact_json_lines(file_path, key='ID'):
+    """
+    Rewrites a JSON Lines file keeping only the latest record for each key.
+
+    Records without the key are kept as they are. The file is replaced atomically.
+
+    Args:
+        file_path (str): The path of the JSON Lines file.
+        key (str, optional): The record field used for deduplication.
+
+    Returns:
+        int: The number of records left in the file.
+    """
+    latest = latest_records(iter_json_lines(file_path), key)
+
+    temp_path = file_path + '.tmp'
+    opener = gzip.open if file_path.endswith('.gz') else open
+    with opener(temp_path, 'wb') as file:
+        for record in latest:
+            file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+    os.replace(temp_path, file_path)
+    return len(latest)
+
+
+def export_json(file_path, output_path=None, latest_only=False, key='ID'):
+    """
+    Exports a JSON Lines file to the legacy indented JSON array format.
+
+    Args:
+        file_path (str): The path of the JSON Lines file.
+        output_path (str, optional): The path of the JSON file. Defaults to the input
+            path with its ``.jsonl``/``.jsonl.gz`` suffix replaced by ``.json``.
+        latest_only (bool, optional): Whether to keep only the latest record per key.
+        key (str, optional): The record field used when ``latest_only`` is set.
+
+    Returns:
+        str: The path of the exported JSON file.
+    """
+    if output_path is None:
+        base_path = file_path[:-3] if file_path.endswith('.gz') else file_path
+        output_path = os.path.splitext(base_path)[0] + '.json'
+
+    records = iter_json_lines(file_path)
+    if latest_only:
+        records = latest_records(records, key)
+
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump(list(records), file, ensure_ascii=False, indent=4)
+
+    print(f'Data saved to {output_path}')
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compact or export JSON Lines output files.")
+    parser.add_argument('command', choices=['compact', 'export'])
+    parser.add_argument('paths', nargs='+', help="JSON Lines files (.jsonl or .jsonl.gz)")
+    parser.add_argument('--latest-only', action='store_true', help="Export only the latest record per product ID")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.command == 'compact':
+            print(f'{path}: {compact_json_lines(path)} records')
+        else:
+            export_json(path, latest_only=args.latest_only)
@@ -0,0 +1,59 @@
+import json
+import asyncio
+import threading
+import pytest
+from aiohttp import web
+from main import cli
+from benchmarks.mock_site import MockSite
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs every test in its own folder, since the scrapers keep their data, cache and state in the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mock_site():
+    """
+    Serves a small mock site on a free local port from a background thread.
+
+    The site's ``base_url`` is set to its address, and its options can be changed while it runs.
+    """
+    site = MockSite(categories=2, pages=2, per_page=4)
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(site.application())
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', 0).start())
+    site.base_url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield site
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(runner.cleanup())
+    loop.close()
+
+
+@pytest.fixture
+def crawl(mock_site):
+    """
+    Runs a command of the command line against the mock site, unpaced and extracting inline by default.
+    """
+    def crawl(command, *args, extract_workers=0):
+        cli([command, '--base-url', mock_site.base_url, '--rate', '0', '--extract-workers', str(extract_workers), *args])
+    return crawl
+
+
+@pytest.fixture
+def product_ids():
+    """
+    Reads the IDs of the products in a JSON Lines output file.
+    """
+    def product_ids(path):
+        with open(path, encoding='utf-8') as file:
+            return {json.loads(line)['ID'] for line in file}
+    return product_ids
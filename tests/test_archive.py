@@ -0,0 +1,23 @@
+from main import cli
+from src.archive import ResponseArchive, PRODUCT
+from benchmarks.mock_site import category_path, product_id
+
+
+def test_product_in_two_categories_is_reextracted_into_both(mock_site, crawl, product_ids):
+    url = mock_site.base_url + category_path(1)
+    variant = url + '?navpath=cat000000_cat44700732'
+
+    crawl('scrape', '--archive', 'archive', url, variant)
+
+    archive = ResponseArchive('archive')
+    # Every product page is archived once, under both categories
+    assert len(archive.latest(PRODUCT)) == 8
+    assert archive.categories(archive.latest(PRODUCT)[0][0]) == sorted([url, variant])
+    assert archive.stats()['fetches'] == 2 * 2 + 8
+    archive.close()
+
+    cli(['reextract', '--archive', 'archive', '--workers', '1'])
+
+    for name in ('bench-cat1', 'bench-cat1_navpath=cat000000_cat44700732'):
+        scraped = product_ids(f'data/reextracted/{name}.jsonl')
+        assert len(scraped) == 8 and product_id(1, 2, 3) in scraped
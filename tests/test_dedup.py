@@ -0,0 +1,15 @@
+from src.history import HistoryStore
+from benchmarks.mock_site import category_path, product_id
+
+
+def test_product_listed_in_two_categories_is_fetched_once(mock_site, crawl):
+    url = mock_site.base_url + category_path(1)
+    variant = url + '?navpath=cat000000_cat44700732'
+
+    crawl('scrape', url, variant)
+
+    # Two listing pages per category and eight products shared by both
+    assert mock_site.requests == 2 * 2 + 8
+    history = HistoryStore()
+    assert history.categories(product_id(1, 2, 3)) == sorted([url, variant])
+    history.close()
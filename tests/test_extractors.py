@@ -0,0 +1,97 @@
+import os
+import re
+import copy
+import glob
+import json
+import random
+import pytest
+from benchmarks import legacy_extract
+from benchmarks.mock_site import BLOCK_PAGE
+from src.item_extract import extract_product_data
+from src.json_extract import extract_json_payload, extract_json_payload_dom, JSON_SCRIPT_OPEN, SCRIPT_CLOSE
+from src.listing_extract import LISTING_EXTRACTORS, available_listing_extractors
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'benchmarks', 'fixtures')
+PRODUCT_FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, 'product_*.html')))
+LISTING_FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, 'listing_*.html')))
+BASE_URL = "https://www.neimanmarcus.com"
+URL = "https://www.neimanmarcus.com/en-id/p/fixture-prod0"
+# Number of variants of each product fixture with random fields removed
+VARIANTS = 200
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def prune(value, rng, rate=0.1):
+    """
+    Returns a copy of a payload with a random share of its dictionary keys removed.
+    """
+    if isinstance(value, dict):
+        return {key: prune(item, rng, rate) for key, item in value.items() if rng.random() >= rate}
+    if isinstance(value, list):
+        return [prune(item, rng, rate) for item in value]
+    return value
+
+
+def pruned_payloads(path, seed=0):
+    rng = random.Random(seed)
+    payload = extract_json_payload(read(path))
+    return [payload] + [prune(payload, rng) for _ in range(VARIANTS)]
+
+
+def replace_payload(body, payload):
+    """
+    Embeds another payload in a product page in place of its JSON script.
+    """
+    start = JSON_SCRIPT_OPEN.search(body).end()
+    end = SCRIPT_CLOSE.search(body, start).start()
+    return body[:start] + json.dumps(payload).encode() + body[end:]
+
+
+def listing_variants(content):
+    """
+    Yields a listing page and variants of it with links, the next page arrow or the pagination removed.
+    """
+    yield content
+    for position in range(3):
+        links = list(re.finditer(rb'(<a class="product-thumbnail__link") href="[^"]*"', content))
+        link = links[position]
+        yield content[:link.start()] + link.group(1) + content[link.end():]
+    yield re.sub(rb'<a class="arrow-button[^>]*></a>', b'', content)
+    yield re.sub(rb'<nav class="pagination">.*?</nav>', b'', content, flags=re.DOTALL)
+
+
+def run(extract, payload):
+    """
+    Runs an extractor, returning its output as JSON text, or the exception it raised.
+    """
+    try:
+        return json.dumps(extract(copy.deepcopy(payload), URL), ensure_ascii=False)
+    except Exception as e:
+        return repr(e)
+
+
+@pytest.mark.parametrize('path', PRODUCT_FIXTURES, ids=os.path.basename)
+def test_extract_product_data_matches_the_legacy_extractor(path):
+    for payload in pruned_payloads(path):
+        assert run(extract_product_data, payload) == run(legacy_extract.extract_product_data, payload)
+
+
+@pytest.mark.parametrize('path', PRODUCT_FIXTURES, ids=os.path.basename)
+def test_json_fast_path_matches_the_dom_parse(path):
+    body = read(path)
+    pages = [replace_payload(body, payload) for payload in pruned_payloads(path)[:20]]
+    pages.append(JSON_SCRIPT_OPEN.sub(b'<script>', body))
+    pages.append(BLOCK_PAGE)
+    for page in pages:
+        assert extract_json_payload(page) == extract_json_payload_dom(page.decode('utf-8'))
+
+
+@pytest.mark.parametrize('name', available_listing_extractors())
+@pytest.mark.parametrize('path', LISTING_FIXTURES, ids=os.path.basename)
+def test_listing_backend_matches_bs4(path, name):
+    for content in listing_variants(read(path)):
+        assert LISTING_EXTRACTORS[name](content, BASE_URL) == LISTING_EXTRACTORS['bs4'](content, BASE_URL)
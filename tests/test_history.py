@@ -0,0 +1,95 @@
+import os
+import json
+from aiohttp import web
+from src.crawl_state import CrawlState
+from src.history import REMOVED_PRODUCT
+from benchmarks.mock_site import category_path, product_id
+
+
+def read_deltas():
+    changes = {}
+    for name in sorted(os.listdir('data/deltas')):
+        with open(os.path.join('data/deltas', name), encoding='utf-8') as file:
+            changes[name] = [json.loads(line) for line in file]
+    return changes
+
+
+def test_removed_products_are_written_to_their_run(mock_site, crawl):
+    crawl('scrape', mock_site.base_url + category_path(1))
+    mock_site.pages = 1
+    crawl('scrape', mock_site.base_url + category_path(1))
+
+    deltas = read_deltas()
+    assert sorted(deltas) == ['run-1.jsonl', 'run-2.jsonl']
+    assert [change['change'] for change in deltas['run-2.jsonl']] == [REMOVED_PRODUCT] * 4
+    assert {change['run_id'] for change in deltas['run-2.jsonl']} == {2}
+
+
+def test_unreadable_sitemap_does_not_remove_its_products(mock_site, crawl):
+    sitemap_options = ['--sitemap', mock_site.base_url + '/sitemap_index.xml', '--name', 'catalog']
+    crawl('scrape', *sitemap_options)
+    product_sitemap = mock_site.product_sitemap
+
+    def broken_product_sitemap(base_url, category):
+        if category == 2:
+            raise web.HTTPNotFound()
+        return product_sitemap(base_url, category)
+
+    mock_site.product_sitemap = broken_product_sitemap
+    crawl('scrape', *sitemap_options)
+
+    assert not any(change['change'] == REMOVED_PRODUCT for changes in read_deltas().values() for change in changes)
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == ['sitemap:catalog']
+    assert not crawl_state.listing_done('sitemap:catalog')
+    crawl_state.close()
+
+    mock_site.product_sitemap = product_sitemap
+    crawl('scrape', *sitemap_options)
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == []
+    crawl_state.close()
+
+
+def test_resumed_crawl_does_not_remove_products_scraped_before_the_interruption(mock_site, crawl):
+    url = mock_site.base_url + category_path(1)
+    # Every run fetches every product again
+    crawl('scrape', '--fresh-ttl', '0', url)
+    poisoned = product_id(1, 1, 0)
+    mock_site.malformed.add(poisoned)
+    crawl('scrape', '--fresh-ttl', '0', url)
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == [url]
+    crawl_state.close()
+
+    mock_site.malformed.clear()
+    crawl('resume', '--fresh-ttl', '0')
+
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == []
+    crawl_state.close()
+    assert not any(change['change'] == REMOVED_PRODUCT for changes in read_deltas().values() for change in changes)
+
+    # The next complete crawl still reports removals
+    mock_site.pages = 1
+    crawl('scrape', url)
+    removed = [change for change in read_deltas()['run-4.jsonl'] if change['change'] == REMOVED_PRODUCT]
+    assert len(removed) == 4
+
+
+def test_product_page_without_product_data_fails_instead_of_being_removed(mock_site, crawl):
+    url = mock_site.base_url + category_path(1)
+    crawl('scrape', '--fresh-ttl', '0', url)
+    blocked = product_id(1, 2, 1)
+    mock_site.blocked.add(blocked)
+
+    crawl('scrape', '--fresh-ttl', '0', url)
+    crawl('resume', '--fresh-ttl', '0')
+    crawl('resume', '--fresh-ttl', '0')
+
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == []
+    [failure] = crawl_state.failures(url)
+    assert blocked in failure['url'] and failure['attempts'] == 3 and 'No product data' in failure['error']
+    crawl_state.close()
+    assert not any(change['change'] == REMOVED_PRODUCT for changes in read_deltas().values() for change in changes)
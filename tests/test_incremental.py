@@ -0,0 +1,56 @@
+import asyncio
+import sqlite3
+import pytest
+from main import cli, MainScraper
+from src.fetch_state import FetchStateStore
+from benchmarks.mock_site import category_path
+
+
+def test_incremental_scrape_skips_unchanged_categories(mock_site, crawl):
+    options = ['--incremental', '--category-sitemap', mock_site.base_url + '/sitemap_category_1.xml.gz',
+               mock_site.base_url + category_path(1)]
+    crawl('scrape', *options)
+    requests = mock_site.requests
+
+    crawl('scrape', *options)
+    # Only the category sitemap was read
+    assert mock_site.requests == requests + 1
+
+    mock_site.category_lastmod = '2024-02-01'
+    crawl('scrape', *options)
+    # The category sitemap and both listing pages
+    assert mock_site.requests == requests + 4
+
+
+def listed_categories(capsys):
+    return [line for line in capsys.readouterr().out.splitlines() if line.startswith('http')]
+
+
+def test_categories_command_lists_only_categories_changed_since_their_crawl(mock_site, crawl, capsys):
+    sitemap = mock_site.base_url + '/sitemap_category_1.xml.gz'
+    changed = ['categories', '--incremental', '--sitemap', sitemap]
+    cli(changed)
+    # Nothing was crawled yet
+    assert listed_categories(capsys) == [mock_site.base_url + category_path(c) for c in (1, 2)]
+
+    crawl('scrape', '--incremental', '--category-sitemap', sitemap, mock_site.base_url + category_path(1))
+    capsys.readouterr()
+    cli(changed)
+    assert listed_categories(capsys) == [mock_site.base_url + category_path(2)]
+
+    mock_site.category_lastmod = '2024-02-01'
+    cli(changed)
+    assert listed_categories(capsys) == [mock_site.base_url + category_path(c) for c in (1, 2)]
+
+
+def test_scraper_closes_the_freshness_state_it_opened():
+    async def open_and_close(**options):
+        async with MainScraper(incremental=True, extract_workers=0, **options) as main_scraper:
+            return main_scraper.state
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        asyncio.run(open_and_close()).connection.execute("SELECT 1")
+    state = FetchStateStore()
+    asyncio.run(open_and_close(state=state))
+    state.connection.execute("SELECT 1")
+    state.close()
@@ -0,0 +1,44 @@
+import socket
+import pstats
+import urllib.request
+from src.metrics import metrics
+from benchmarks.mock_site import category_path, product_id
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_metrics_are_served_during_the_crawl(mock_site, crawl):
+    port = free_port()
+    scraped = []
+    product_page = mock_site.product_page
+
+    def scraping_product_page(identifier):
+        # The crawler waits for this response, so its event loop is free to serve the metrics
+        if identifier == product_id(1, 2, 0) and not scraped:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=10) as response:
+                scraped.append(response.read().decode())
+        return product_page(identifier)
+
+    mock_site.product_page = scraping_product_page
+    crawl('scrape', '--metrics-port', str(port), mock_site.base_url + category_path(1))
+
+    [text] = scraped
+    assert '# TYPE scraper_stage_seconds summary' in text
+    assert 'scraper_stage_seconds_count{stage="listing_fetch"}' in text
+    # The server is stopped with the crawl
+    with socket.socket() as sock:
+        assert sock.connect_ex(('127.0.0.1', port)) != 0
+
+
+def test_profiled_stage_is_dumped_next_to_the_metrics(mock_site, crawl, monkeypatch):
+    monkeypatch.setattr(metrics, 'profiler', None)
+    monkeypatch.setattr(metrics, 'profile_stage', None)
+
+    crawl('scrape', '--profile-stage', 'product_extract', mock_site.base_url + category_path(1))
+
+    stats = pstats.Stats('data/metrics.prof')
+    assert any(function == 'extract_product_data' for _, _, function in stats.stats)
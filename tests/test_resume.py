@@ -0,0 +1,60 @@
+import pytest
+from aiohttp import web
+from src.crawl_state import CrawlState, LISTING, PRODUCT
+from benchmarks.mock_site import category_path, product_id
+
+
+@pytest.mark.parametrize('extract_workers', [0, 1])
+def test_malformed_product_fails_alone_and_is_given_up(mock_site, crawl, product_ids, extract_workers):
+    poisoned = product_id(1, 1, 0)
+    mock_site.malformed.add(poisoned)
+    url = mock_site.base_url + category_path(1)
+
+    crawl('scrape', url, mock_site.base_url + category_path(2), extract_workers=extract_workers)
+
+    scraped = product_ids('data/bench-cat1.jsonl')
+    assert len(scraped) == 7 and poisoned not in scraped
+    assert len(product_ids('data/bench-cat2.jsonl')) == 8
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == [url]
+    [pending] = crawl_state.pending_products(url)
+    assert poisoned in pending
+    crawl_state.close()
+
+    crawl('resume', extract_workers=extract_workers)
+    crawl('resume', extract_workers=extract_workers)
+
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == []
+    [failure] = crawl_state.failures(url)
+    assert failure['kind'] == PRODUCT and failure['attempts'] == 3 and 'KeyError' in failure['error']
+    crawl_state.close()
+
+
+def test_listing_page_that_keeps_failing_is_given_up(mock_site, crawl, product_ids, capsys):
+    listing_page = mock_site.listing_page
+
+    def broken_listing_page(category, page):
+        if page == 2:
+            raise web.HTTPNotFound()
+        return listing_page(category, page)
+
+    mock_site.listing_page = broken_listing_page
+    url = mock_site.base_url + category_path(1)
+
+    crawl('scrape', url)
+    assert len(product_ids('data/bench-cat1.jsonl')) == 4
+    crawl('resume')
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == [url]
+    crawl_state.close()
+
+    crawl('resume')
+    crawl_state = CrawlState()
+    assert crawl_state.categories() == []
+    [failure] = crawl_state.failures(url)
+    assert failure['kind'] == LISTING and failure['attempts'] == 3
+    crawl_state.close()
+
+    crawl('resume')
+    assert capsys.readouterr().out.endswith("Nothing to resume\n")
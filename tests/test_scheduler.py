@@ -0,0 +1,103 @@
+import time
+import asyncio
+import aiohttp
+import pytest
+from src.scheduler import RequestScheduler
+
+
+def product_url(site):
+    return site.base_url + '/en-id/p/bench-item-prod100010000'
+
+
+async def fetch_all(scheduler, url, count=1):
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(scheduler.fetch(session, url) for _ in range(count)), return_exceptions=True)
+
+
+def test_fetch_honors_retry_after(mock_site):
+    mock_site.error_rate = 1.0
+    mock_site.error_status = 429
+    mock_site.retry_after = 0.5
+    scheduler = RequestScheduler(rate=None, max_retries=1)
+
+    start = time.monotonic()
+    [error] = asyncio.run(fetch_all(scheduler, product_url(mock_site)))
+
+    assert time.monotonic() - start >= 0.5
+    assert isinstance(error, aiohttp.ClientResponseError) and error.status == 429
+    assert mock_site.requests == 2
+
+
+def test_fetch_stops_after_retry_limit(mock_site):
+    mock_site.error_rate = 1.0
+    scheduler = RequestScheduler(rate=None, max_retries=2)
+
+    [error] = asyncio.run(fetch_all(scheduler, product_url(mock_site)))
+
+    assert isinstance(error, aiohttp.ClientResponseError) and error.status == 503
+    assert mock_site.requests == 3
+    assert scheduler.retries == 2
+
+
+def test_concurrency_backs_off_when_throttled_and_recovers(mock_site):
+    mock_site.error_rate = 1.0
+    mock_site.error_status = 429
+    scheduler = RequestScheduler(rate=None, max_concurrency=8, max_retries=0)
+    host = scheduler.host(mock_site.base_url)
+
+    asyncio.run(fetch_all(scheduler, product_url(mock_site), 8))
+    assert host.limit == 1
+    assert scheduler.throttled == 8
+
+    mock_site.error_rate = 0.0
+    responses = asyncio.run(fetch_all(scheduler, product_url(mock_site), 20))
+    assert all(response.status == 200 for response in responses)
+    assert 1 < host.limit <= 8
+
+
+def test_rate_paces_requests_under_latency(mock_site):
+    mock_site.latency = 0.05
+    scheduler = RequestScheduler(rate=10, burst=1)
+
+    start = time.monotonic()
+    responses = asyncio.run(fetch_all(scheduler, product_url(mock_site), 5))
+
+    assert all(response.status == 200 for response in responses)
+    # The first request uses the burst token, the other four wait 0.1s each
+    assert time.monotonic() - start >= 0.4
+
+
+def test_fetch_sync_retries_throttled_requests(mock_site):
+    import requests
+
+    mock_site.error_rate = 1.0
+    mock_site.error_status = 429
+    scheduler = RequestScheduler(rate=None, max_retries=1)
+
+    with pytest.raises(requests.HTTPError):
+        scheduler.fetch_sync(product_url(mock_site))
+    assert mock_site.requests == 2
+
+
+def test_fetch_sync_counts_requests_from_several_threads(mock_site):
+    from concurrent.futures import ThreadPoolExecutor
+
+    scheduler = RequestScheduler(rate=None)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda _: scheduler.fetch_sync(product_url(mock_site)), range(40)))
+
+    assert all(response.status == 200 for response in responses)
+    assert scheduler.requests == mock_site.requests == 40
+
+
+def test_fetch_sync_uses_the_configured_timeout(mock_site):
+    import requests
+    from main import MainScraper
+
+    mock_site.latency = 0.5
+    scheduler = MainScraper(timeout=0.1, rate=None, extract_workers=0).scheduler
+    assert scheduler.timeout == 0.1
+    scheduler.max_retries = 0
+
+    with pytest.raises(requests.Timeout):
+        scheduler.fetch_sync(product_url(mock_site))
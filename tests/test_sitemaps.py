@@ -0,0 +1,34 @@
+from src.scheduler import RequestScheduler
+from src.category_scraper import CategoryScraper
+from benchmarks.mock_site import product_id
+
+
+def test_iter_sitemaps_follows_index_into_gzipped_sitemaps(mock_site):
+    category_scraper = CategoryScraper(scheduler=RequestScheduler(rate=None))
+
+    records = list(category_scraper.iter_sitemaps([mock_site.base_url + '/sitemap_index.xml']))
+
+    assert sorted(record["URL"] for record in records) == sorted(
+        mock_site.product_urls(mock_site.base_url, 1) + mock_site.product_urls(mock_site.base_url, 2))
+    assert {record["LastModified"] for record in records} == {'2024-01-01'}
+
+
+def test_sitemap_crawl_writes_every_product(mock_site, crawl, product_ids):
+    crawl('scrape', '--sitemap', mock_site.base_url + '/sitemap_index.xml', '--name', 'catalog')
+
+    scraped = product_ids('data/catalog.jsonl')
+    assert len(scraped) == 16 and product_id(2, 2, 3) in scraped
+
+
+def test_interrupted_sitemap_crawl_resumes_pending_products(mock_site, crawl, product_ids):
+    broken = product_id(1, 1, 2)
+    mock_site.malformed.add(broken)
+
+    crawl('scrape', '--sitemap', mock_site.base_url + '/sitemap_index.xml', '--name', 'catalog')
+    mock_site.malformed.clear()
+    requests = mock_site.requests
+    crawl('resume')
+
+    # Only the pending product is fetched again, without reading the sitemaps
+    assert mock_site.requests == requests + 1
+    assert len(product_ids('data/catalog.jsonl')) == 16
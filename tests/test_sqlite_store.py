@@ -0,0 +1,22 @@
+import pytest
+from src.crawl_state import CrawlState
+from src.workqueue import SQLiteWorkQueue
+
+
+def test_failed_transaction_is_rolled_back(tmp_path):
+    crawl_state = CrawlState(str(tmp_path / 'crawl_state.db'))
+    with pytest.raises(RuntimeError):
+        with crawl_state.transaction() as connection:
+            connection.execute("INSERT INTO categories (category) VALUES ('a')")
+            raise RuntimeError
+    assert crawl_state.categories() == []
+    crawl_state.close()
+
+
+def test_stores_open_their_files_the_same_way(tmp_path):
+    first = CrawlState(str(tmp_path / 'state' / 'crawl_state.db'))
+    second = SQLiteWorkQueue(str(tmp_path / 'state' / 'workqueue.db'))
+    for store in (first, second):
+        assert store.connection.execute("PRAGMA journal_mode").fetchone() == ('wal',)
+        assert store.connection.execute("PRAGMA busy_timeout").fetchone() == (60000,)
+        store.close()
@@ -0,0 +1,79 @@
+import pytest
+from main import cli
+from src.cache import RedisProductCache
+from src.workqueue import SQLiteWorkQueue, RedisWorkQueue, product_task
+from benchmarks.mock_site import category_path
+
+PRODUCT_URL = 'https://www.neimanmarcus.com/en-id/p/herend-charger-prod203145566'
+CATEGORIES = ['https://www.neimanmarcus.com/en-id/c/a-cat1', 'https://www.neimanmarcus.com/en-id/c/b-cat2']
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def queue(request, tmp_path):
+    if request.param == 'sqlite':
+        queue = SQLiteWorkQueue(str(tmp_path / 'workqueue.db'))
+    else:
+        fakeredis = pytest.importorskip('fakeredis')
+        queue = RedisWorkQueue(client=fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    yield queue
+    queue.close()
+
+
+def test_product_found_in_two_categories_is_queued_once(queue):
+    assert queue.put([product_task(PRODUCT_URL, CATEGORIES[0]),
+                      product_task(PRODUCT_URL + '?childItemId=NMH3RBR_', CATEGORIES[1])]) == 1
+    assert queue.put([product_task(PRODUCT_URL, CATEGORIES[1])]) == 0
+
+    [lease] = queue.lease(10)
+    assert lease.task['categories'] == CATEGORIES
+
+
+def test_product_found_in_a_new_category_after_it_is_done_is_queued_for_it_alone(queue):
+    queue.put([product_task(PRODUCT_URL, CATEGORIES[0])])
+    queue.ack(queue.lease()[0])
+
+    assert queue.put([product_task(PRODUCT_URL, CATEGORIES[0])]) == 0
+    assert queue.put([product_task(PRODUCT_URL, CATEGORIES[1])]) == 1
+    [lease] = queue.lease()
+    assert lease.task['categories'] == [CATEGORIES[1]]
+
+
+def test_category_added_while_leased_is_not_lost_on_ack(queue):
+    queue.put([product_task(PRODUCT_URL, CATEGORIES[0])])
+    [lease] = queue.lease()
+    queue.put([product_task(PRODUCT_URL, CATEGORIES[1])])
+
+    queue.ack(lease)
+
+    [lease] = queue.lease()
+    assert lease.task['categories'] == [CATEGORIES[1]]
+    queue.ack(lease)
+    assert queue.lease() == []
+    assert queue.stats()['ready'] == queue.stats()['leased'] == 0
+
+
+def test_workers_fetch_a_product_once_for_every_category(mock_site, crawl, product_ids):
+    url = mock_site.base_url + category_path(1)
+    variant = url + '?navpath=cat000000_cat44700732'
+
+    cli(['seed', '--queue', 'state/workqueue.db', url, variant])
+    crawl('worker', '--queue', 'state/workqueue.db', '--worker-id', 'w')
+
+    # Two listing pages per category and eight products shared by both
+    assert mock_site.requests == 2 * 2 + 8
+    for name in ('bench-cat1', 'bench-cat1_navpath=cat000000_cat44700732'):
+        assert len(product_ids(f'data/{name}.w.jsonl')) == 8
+
+
+def test_redis_cache_is_shared_across_nodes():
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    first = RedisProductCache(client=fakeredis.FakeRedis(server=server))
+    second = RedisProductCache(client=fakeredis.FakeRedis(server=server))
+
+    first.set(PRODUCT_URL, [{'ID': 'prod203145566'}])
+
+    assert second.get(PRODUCT_URL) == [{'ID': 'prod203145566'}]
+    assert second.stats()['hits'] == 1 and second.stats()['entries'] == 2
+    second.touch(PRODUCT_URL)
+    assert 0 < second.client.pttl(second.prefix + second._product_key(PRODUCT_URL)) <= second.ttl * 1000